@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+
+"""Batch versions of the hand checks in pyriichi.scoring, for evaluating many
+hands at once.  Requires NumPy.
+
+All functions take counts, an (N, 34) array of hands in count
+representation (one hand per row), and return an array with one result per
+row.  Results are the same as calling the pyriichi.scoring function of the
+same name on each row.
+
+walls() shuffles many walls at once for pyriichi.wall.Wall.from_array().
+
+"""
+
+import numpy
+
+import pyriichi.scoring as scoring
+
+def iscomplete(counts):
+    """Returns a bool array; True where the hand is complete."""
+    counts = _ascounts(counts)
+    flags = _flags(counts)
+    total = counts.sum(1)
+    orphans = counts[:, scoring._ORPHANS]
+
+    nonzero = flags != 0
+    melds = (flags & scoring._MELDS) != 0
+    pair = (flags & scoring._PAIR) != 0
+    forced = (nonzero & ~melds).sum(1)
+    anypair = (melds & pair).any(1)
+    result = nonzero.all(1) & ((forced == 1) | (forced == 0) & anypair)
+
+    result |= (total == 14) & ((counts == 2).sum(1) == 7)
+    result |= ((total == 14) & (orphans > 0).all(1) &
+               (orphans.sum(1) == 14))
+    return result
+
+def istenpai(counts):
+    """Returns a bool array; True where the hand has at least one wait."""
+    return waitmask(counts) != 0
+
+def waitmask(counts):
+    """Returns a uint64 array of wait masks as in scoring.waitmask()."""
+    counts = _ascounts(counts)
+    flags = _flags(counts)
+    total = counts.sum(1)
+    orphans = counts[:, scoring._ORPHANS]
+
+    nonzero = flags != 0
+    melds = (flags & scoring._MELDS) != 0
+    pair = (flags & scoring._PAIR) != 0
+    pair_only = nonzero & ~melds
+    flexible = melds & pair
+    nzcount = nonzero.sum(1)
+    forced = pair_only.sum(1)
+    flexcount = flexible.sum(1)
+
+    mask = numpy.zeros(len(counts), dtype=numpy.uint64)
+    for g, (start, size, table) in enumerate(scoring._GROUPS):
+        others = nzcount - nonzero[:, g] == 3
+        others_forced = forced - pair_only[:, g]
+        others_flexible = flexcount - flexible[:, g] > 0
+        waits = _bygroup(
+            counts, start, size,
+            lambda row: scoring._groupwaits(row, start, size, table), 2)
+        shift = numpy.uint64(start)
+        take = others & ((others_forced == 1) |
+                         (others_forced == 0) & others_flexible)
+        mask |= numpy.where(take, waits[:, 0], 0).astype(numpy.uint64) << shift
+        take = others & (others_forced == 0)
+        mask |= numpy.where(take, waits[:, 1], 0).astype(numpy.uint64) << shift
+
+    # Seven Pairs
+    single = ((total == 13) & ((counts == 2).sum(1) == 6) &
+              ((counts == 1).sum(1) == 1))
+    bit = numpy.left_shift(numpy.uint64(1),
+                           (counts == 1).argmax(1).astype(numpy.uint64))
+    mask |= numpy.where(single, bit, numpy.uint64(0))
+    # 13 Orphans
+    kokushi = (total == 13) & (orphans.sum(1) == 13)
+    present = orphans > 0
+    missing = (~present).sum(1)
+    for j, i in enumerate(scoring._ORPHANS):
+        take = kokushi & (missing - ~present[:, j] == 0)
+        mask |= numpy.where(take, numpy.uint64(1 << i), numpy.uint64(0))
+    return mask
+
+def shanten(counts, melds=0):
+    """Returns an int array of shanten numbers as in scoring.shanten().
+
+    melds
+        number of declared sets; either one int for all hands or an array
+        with one int per hand
+
+    """
+    counts = _ascounts(counts)
+    melds = numpy.broadcast_to(numpy.asarray(melds, dtype=numpy.int64),
+                               (len(counts),))
+    total = counts.sum(1)
+    orphans = counts[:, scoring._ORPHANS]
+
+    # regular hands; only evaluate each distinct combination of group shapes
+    keys = numpy.column_stack(
+        [_keys(counts, start, size) for start, size, table in scoring._GROUPS]
+        + [melds])
+    uniq, index, inverse = numpy.unique(keys, axis=0, return_index=True,
+                                        return_inverse=True)
+    values = numpy.zeros(len(index), dtype=numpy.int64)
+    for j, i in enumerate(index):
+        values[j] = scoring._regular_shanten(counts[i].tolist(), int(melds[i]))
+    result = values[inverse.reshape(-1)]
+
+    pairs = (counts >= 2).sum(1)
+    kinds = (counts > 0).sum(1)
+    sevenpairs = 6 - pairs + numpy.maximum(0, 7 - kinds)
+    kokushi = 13 - (orphans > 0).sum(1) - (orphans >= 2).any(1)
+    special = (melds == 0) & (total >= 13)
+    result = numpy.where(special,
+                         numpy.minimum(result,
+                                       numpy.minimum(sevenpairs, kokushi)),
+                         result)
+    return result
+
+def walls(count, seed=None):
+    """Returns a (count, 136) uint8 array of shuffled walls, one per row.
+    Wrap a row with pyriichi.wall.Wall.from_array().
+
+    seed
+        seed for numpy.random.default_rng(): an int, a
+        numpy.random.SeedSequence or None for fresh entropy.  The same seed
+        always gives the same walls.
+
+    """
+    result = numpy.tile(numpy.arange(136, dtype=numpy.uint8), (count, 1))
+    numpy.random.default_rng(seed).permuted(result, axis=1, out=result)
+    return result
+
+def _ascounts(counts):
+    """Returns counts as an (N, 34) int64 array."""
+    counts = numpy.asarray(counts, dtype=numpy.int64)
+    if counts.ndim != 2 or counts.shape[1] != 34:
+        raise scoring.ScoringException(
+            "batch", "expected an (N, 34) array, got " + str(counts.shape))
+    return counts
+
+def _keys(counts, start, size):
+    """Returns scoring._suitkey() of each row."""
+    return counts[:, start:start + size].dot(_POWERS[:size])
+
+def _flags(counts):
+    """Returns an (N, 4) array of agari table flags for each group."""
+    return numpy.column_stack([
+        _bygroup(counts, start, size,
+                 lambda row: [table.get(scoring._suitkey(row, start, size),
+                                        0)])[:, 0]
+        for start, size, table in scoring._GROUPS])
+
+def _bygroup(counts, start, size, func, width=1):
+    """Returns an (N, width) array of func(row) for each row, calling func
+    once per distinct shape of counts[:, start:start + size].  func returns a
+    sequence of width ints."""
+    uniq, index, inverse = numpy.unique(_keys(counts, start, size),
+                                        return_index=True,
+                                        return_inverse=True)
+    values = numpy.zeros((len(index), width), dtype=numpy.int64)
+    for j, i in enumerate(index):
+        values[j] = func(counts[i].tolist())
+    return values[inverse.reshape(-1)]
+
+_POWERS = numpy.array([1 << 4 * i for i in range(9)], dtype=numpy.int64)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+from __future__ import division
+import collections
+import threading
+
+class LRUCache:
+    """Mapping that holds at most maxsize items, evicting the least recently
+    used item when full.
+
+    One cache may be shared between threads: get(), item assignment,
+    resize(), clear() and hitrate() hold a lock, so a get() never races an
+    eviction and hits and misses are not lost.  len() and in are single
+    dict operations and need none.
+
+    Attributes
+        maxsize
+            maximum number of items held; change with resize()
+        hits
+            number of get() calls that found their key
+        misses
+            number of get() calls that did not
+
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Returns number of items in cache."""
+        return len(self.items)
+
+    def __contains__(self, key):
+        """Tests key without counting a hit or miss or refreshing it."""
+        return key in self.items
+
+    def __setitem__(self, key, value):
+        """Adds or replaces an item, evicting the least recently used items
+        if there are more than maxsize."""
+        with self._lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Returns the item for key and marks it most recently used, or
+        returns default if there is none."""
+        with self._lock:
+            try:
+                value = self.items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def resize(self, maxsize):
+        """Sets maxsize, evicting items if needed."""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        """Removes all items and resets hits and misses."""
+        with self._lock:
+            self.items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def hitrate(self):
+        """Returns the fraction of get() calls that were hits, or 0 if there
+        were none."""
+        with self._lock:
+            hits, total = self.hits, self.hits + self.misses
+        if not total:
+            return 0
+        return hits / total
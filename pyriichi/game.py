@@ -3,6 +3,7 @@
 import random
 
 import pyriichi.player
+import pyriichi.tiles
 import pyriichi.wall
 
 class Hand:
@@ -20,7 +21,8 @@ class Hand:
 
     """
 
-    def __init__(self, round_wind, dealer, honba, riichi_pot, players):
+    def __init__(self, round_wind, dealer, honba, riichi_pot, players,
+                 wall=None, seed=None, rng=None):
         """round_wind
         current round wind as an int in range(4)
         dealer
@@ -32,6 +34,14 @@ class Hand:
         players
             original player list.  Hand will reorder hand internally so that
             the dealer is the first item.
+        wall
+            Wall to deal from, such as one from Wall.from_array().  Defaults
+            to a new Wall shuffled with rng.
+        seed
+            seed for a new random.Random used for the wall and dice; the same
+            seed always plays out the same shuffle and rolls
+        rng
+            random.Random instance to use instead of a new one
 
         Attributes set after winning:
 
@@ -47,8 +57,12 @@ class Hand:
         self.players = players[dealer:] + players[:dealer]
         for player in self.players:
             player.clear()
-        self.wall = pyriichi.wall.Wall()
-        self.dice = Dice()
+        if rng is None:
+            rng = random.Random(seed)
+        if wall is None:
+            wall = pyriichi.wall.Wall(rng=rng)
+        self.wall = wall
+        self.dice = Dice(rng=rng)
 
         self.current_player = 0
         self.current_discard = None
@@ -99,6 +113,63 @@ class Hand:
             self.current_discard = tile
             self.step = 2
 
+    def claim_options(self):
+        """Returns every claim the other players can make on the current
+        discard, highest priority first: ron, then pon and kan, then chi.
+        Claims of the same kind follow turn order from the discarder.
+        Returns an empty list if there is no current discard.
+
+        Each claim is a tuple (kind, player, tiles)
+            kind
+                'ron', 'kan', 'pon' or 'chi'
+            player
+                claiming player by index
+            tiles
+                list of the tiles in the player's hand that the discard would
+                join; empty for ron.  For chi, pass it to chi().
+
+        Ron is offered when the discard completes the hand and the player is
+        not furiten; yaku are not checked.  Pon, kan and chi are not offered
+        to players in riichi, nor to anyone on the last discard of the hand,
+        when the wall is empty.  Kan is not offered once four kans have
+        been declared.
+
+        """
+        tile = self.current_discard
+        if tile is None:
+            return []
+        cmpval = tile.cmpval
+        value = pyriichi.tiles.VALUE[cmpval]
+        # houtei: the last discard may only be won on
+        calling = len(self.wall) > 0
+        kan = self.wall.dead.can_kan()
+        rons = []
+        calls = []
+        chis = []
+        for i in range(1, 4):
+            num = (self.current_player + i) % 4
+            player = self.players[num]
+            count = player.count
+            if player.can_ron(tile) and not player.furiten:
+                rons.append(('ron', num, []))
+            if not calling or player.riichi:
+                continue
+            if count[cmpval] >= 2:
+                start = sum(count[:cmpval])
+                if kan and count[cmpval] >= 3:
+                    calls.append(('kan', num, player.hand[start:start + 3]))
+                calls.append(('pon', num, player.hand[start:start + 2]))
+            if i == 1 and value:
+                for low in range(max(1, value - 2), min(value, 7) + 1):
+                    others = [x for x in range(cmpval - value + low,
+                                               cmpval - value + low + 3)
+                              if x != cmpval]
+                    if count[others[0]] and count[others[1]]:
+                        chis.append(('chi', num,
+                                     [player.hand[sum(count[:x])]
+                                      for x in others]))
+        return rons + calls + chis
+
     def agari(self, player):
         """Player calls win on current player's discard or self-draw.
 
@@ -109,8 +180,13 @@ class Hand:
         player
             player by index number
 
+        Raises FuritenError if the win is on a discard and the player is
+        furiten.
+
         """
         playeri = self.players[player]
+        if self.current_player != player and playeri.furiten:
+            raise FuritenError("player " + str(player) + " is furiten")
         east = 0
         if player is self.players[0]:
             east = 1
@@ -121,7 +197,7 @@ class Hand:
         if self.current_player != player:
             self.current_discard.last = 1
             self.current_discard.ron = 1
-            playeri.hand.append(self.current_discard)
+            playeri.add(self.current_discard)
 
             # renhou test
             if self.first_round:
@@ -243,11 +319,11 @@ class Hand:
 
         """
         x = self.players[player]
+        self._pass_discard()
         # hide in current player's discards
         self.current_discard.hidden = 1
 
-        x.hand.append(self.current_discard)
-        x.sort()
+        x.add(self.current_discard)
         set = []
         for i in range(3):
             for tile in x.hand:
@@ -272,11 +348,11 @@ class Hand:
             
         """
         x = self.players[player]
+        self._pass_discard()
         # hide in current player's discards
         self.current_discard.hidden = 1
 
-        x.hand.append(self.current_discard)
-        x.sort()
+        x.add(self.current_discard)
         set = []
         for i in range(4):
             for tile in x.hand:
@@ -320,11 +396,11 @@ class Hand:
 
         """
         x = self.players[(self.current_player + 1) % 4]
+        self._pass_discard()
         # hide in current player's discards
         self.current_discard.hidden = 1
 
-        x.hand.append(self.current_discard)
-        x.sort()
+        x.add(self.current_discard)
         tiles.append(self.current_discard)
         x.chi(tiles)
         # change current player
@@ -336,11 +412,20 @@ class Hand:
         if self.first_round:
             self.first_round = 0
 
+    def _pass_discard(self):
+        """Marks the other players who could have won on the current discard
+        as having let it go by (see Player.miss())."""
+        for i in range(1, 4):
+            player = self.players[(self.current_player + i) % 4]
+            if player.can_ron(self.current_discard):
+                player.miss(self.current_discard)
+
     def cycle(self):
         """Ends player turn by resetting flags and cycling to the next
         player."""
         if self.step == 2:
             self.step = 0
+            self._pass_discard()
             self.current_discard = None
             self.current_player += 1
             if self.first_round and self.current_player > 4:
@@ -406,10 +491,30 @@ class Game:
         del self.hand
 
 
+class HandError(Exception):
+    def __init__(self, val):
+        self.val = val
+
+    def __str__(self):
+        return repr(self.val)
+
+
+class FuritenError(HandError):
+    pass
+
+
 class Dice:
     """Two six-sided die."""
-    def __init__(self):
-        random.seed()
+    def __init__(self, seed=None, rng=None):
+        """seed
+            seed for a new random.Random to roll with
+        rng
+            random.Random instance to roll with instead of a new one
+
+        """
+        if rng is None:
+            rng = random.Random(seed)
+        self.rng = rng
     def roll(self):
         """Returns 2d6"""
-        return random.randint(1, 6) + random.randint(1, 6)
+        return self.rng.randint(1, 6) + self.rng.randint(1, 6)
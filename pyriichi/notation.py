@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+"""mpsz notation
+
+A hand is written as groups of digits, each followed by its suit: m for
+MANZU, p for PINZU, s for SOUZU and z for honors, where z1 to z7 are E, S,
+W, N, Wh, Gr, Rd.  0 is a red five.  e.g. "123m406p789s11z"
+
+One copy of each five is the red five (see pyriichi.tiles.RED_IDS), so
+only three fives of a suit can be plain: all four are written "0555m".
+parse() and parseids() reject "5555m"; parsecount(), which has no red
+fives, takes either.
+
+parse() and format() convert between notation and lists of tiles, and
+parseids(), parsecount(), formatids() and formatcount() do the same for ids
+and count representation without making any tiles.  parsefile() parses a
+file of hands, one per line.
+
+"""
+
+import re
+
+import pyriichi.scoring as scoring
+import pyriichi.tiles as tiles
+
+def parse(text):
+    """Returns a list of new tiles for the hand in text, in the order
+    written.  The tiles have ids as from parseids()."""
+    return tiles.fromids(parseids(text))
+
+def parseids(text):
+    """Returns a list of distinct ids for the hand in text, in the order
+    written.  Copies of a tile get its ids in order; plain fives never get a
+    red five's id.  Raises NotationError if text has more copies of a tile
+    than there are, including four plain fives."""
+    result = []
+    copies = list(_FIRSTCOPY)
+    reds = [0] * 34
+    for digits, base in _groups(text):
+        for char in digits:
+            value = ord(char) - 48
+            if value:
+                cmpval = base + value
+                id = cmpval * 4 + copies[cmpval]
+                copies[cmpval] += 1
+                if copies[cmpval] > 4:
+                    if value == 5 and not reds[cmpval]:
+                        raise NotationError(
+                            "parseids", "four plain fives in " + text +
+                            "; write one as 0")
+                    raise NotationError(
+                        "parseids", "too many copies of " + char + " in " +
+                        text)
+            else:
+                cmpval = base + 5
+                id = cmpval * 4
+                if reds[cmpval]:
+                    raise NotationError(
+                        "parseids", "more than one red five in " + text)
+                reds[cmpval] = 1
+            result.append(id)
+    return result
+
+def parsecount(text):
+    """Returns the hand in text as a scoring.Count.  Raises NotationError if
+    text has more than four copies of a tile or more than one red five of a
+    suit."""
+    count = scoring.Count(scoring._ZEROS)
+    reds = [0] * 34
+    for digits, base in _groups(text):
+        for char in digits:
+            cmpval = base + ((ord(char) - 48) or 5)
+            if char == '0':
+                if reds[cmpval]:
+                    raise NotationError(
+                        "parsecount", "more than one red five in " + text)
+                reds[cmpval] = 1
+            count[cmpval] += 1
+            if count[cmpval] > 4:
+                raise NotationError(
+                    "parsecount", "too many copies of " + char + " in " +
+                    text)
+    return count
+
+def parsefile(file, parser=parseids):
+    """Parses a hand on each line of file, skipping blank lines.  Returns an
+    iterator of the results.
+
+    file
+        open file or other iterable of lines
+    parser
+        function used to parse each line: parse, parseids or parsecount
+
+    """
+    for line in file:
+        line = line.strip()
+        if line:
+            yield parser(line)
+
+def format(hand):
+    """Returns hand, a list of tiles, in notation."""
+    count = [0] * 34
+    reds = [0] * 34
+    for tile in hand:
+        count[tile.cmpval] += 1
+        if hasattr(tile, "red"):
+            reds[tile.cmpval] += 1
+    return _format(count, reds)
+
+def formatids(ids):
+    """Returns ids in notation."""
+    reds = [0] * 34
+    for id in ids:
+        if id in tiles.RED_IDS:
+            reds[id >> 2] += 1
+    return _format(tiles.idcount(ids), reds)
+
+def formatcount(count):
+    """Returns count in notation.  Count representation has no red fives."""
+    return _format(count, [0] * 34)
+
+def _groups(text):
+    """Yields (digits, base) for each group in text, where base + value is
+    the cmpval of each digit's tile (5 for 0).  Raises NotationError if text
+    is not in notation."""
+    text = text.strip()
+    end = 0
+    for match in _GROUP.finditer(text):
+        if match.start() != end:
+            break
+        end = match.end()
+        digits, suit = match.groups()
+        if suit == 'z' and ('0' in digits or '8' in digits or '9' in digits):
+            raise NotationError("parse", "no such honor in " + text)
+        yield digits, _BASES[suit]
+    if end != len(text):
+        raise NotationError("parse", "not in notation: " + text)
+
+def _format(count, reds):
+    """Returns notation for count, of which reds are red fives."""
+    result = []
+    for suit, start, size in _SUITS:
+        digits = []
+        for i in range(start, start + size):
+            digits.append('0' * reds[i] + _DIGITS[i - start] *
+                          (count[i] - reds[i]))
+        digits = ''.join(digits)
+        if digits:
+            result.append(digits + suit)
+    return ''.join(result)
+
+_GROUP = re.compile(r'([0-9]+)([mpsz])')
+# cmpval of each suit's tile with value 0
+_BASES = {'p': -1, 's': 8, 'm': 17, 'z': 26}
+# (suit, first cmpval, number of tiles), in the order format() writes them
+_SUITS = (('m', 18, 9), ('p', 0, 9), ('s', 9, 9), ('z', 27, 7))
+_DIGITS = '123456789'
+# copies of each tile taken before any plain copy; 1 for fives, whose first
+# copy is red
+_FIRSTCOPY = [1 if i * 4 in tiles.RED_IDS else 0 for i in range(34)]
+
+
+class NotationError(Exception):
+    def __init__(self, func, val):
+        self.func = func
+        self.val = val
+    def __str__(self):
+        return self.func + ":" + repr(self.val)
@@ -2,9 +2,43 @@
 
 from __future__ import division
 
+import bisect
+
 import pyriichi.scoring
+import pyriichi.tiles
 
 class Player:
+    """A player's tiles and state in a hand.
+
+    Attributes
+        hand
+            list of the tiles in hand, kept sorted by cmpval; tiles of the
+            same kind keep the order they were added in.  Change it only
+            through Player methods, which keep count in step.
+        count
+            hand as a scoring.Count.  It is tracker.count itself, kept up to
+            date by tracker; never rebind it.
+        tracker
+            scoring.WaitTracker of hand, for waitmask()
+        sets
+            list of declared sets
+        discards
+            list of discarded tiles
+        discardmask
+            int with bit n set if player has discarded the tile with cmpval
+            n, as in scoring.waitmask()
+        current_draw
+            the tile last drawn, until it or another tile is discarded;
+            unset otherwise
+
+    Player has __slots__, so it holds no other attributes.  snapshot() and
+    restore() save and roll back all of the above.
+
+    """
+    __slots__ = ('points', 'wind', 'hand', 'tracker', 'count', 'sets',
+                 'discards', 'discardmask', 'missed', 'riichi_missed',
+                 'riichi', 'double_riichi', 'ippatsu', 'current_draw')
+
     def __init__(self, wind_num, points=25000):
         """wind_num
             the player's wind from ['east', 'south', 'west', 'north']
@@ -23,13 +57,49 @@ class Player:
     def draw(self, wall):
         """Add tile drawn from wall to hand."""
         self.current_draw = wall.draw()
-        self.hand.append(self.current_draw)
+        self.add(self.current_draw)
+
+    def deal(self, tiles):
+        """Add a starting hand to hand, sorting once.  The last tile of tiles
+        becomes the current draw, as if each had been drawn in turn.
+
+        tiles
+            list of tiles in the order dealt
+
+        """
+        self.hand.extend(tiles)
+        for tile in tiles:
+            self.tracker.add(tile.cmpval)
+        self.current_draw = tiles[-1]
         self.sort()
 
+    def add(self, tile):
+        """Add tile to hand in sorted position, e.g. a claimed discard."""
+        bisect.insort_right(self.hand, tile)
+        self.tracker.add(tile.cmpval)
+
+    def remove(self, tile):
+        """Remove tile from hand: tile itself if it is in hand, else the
+        first tile equal to it.  Raises ValueError if there is none."""
+        hand = self.hand
+        first = i = bisect.bisect_left(hand, tile)
+        while i < len(hand) and hand[i] == tile:
+            if hand[i] is tile:
+                break
+            i += 1
+        else:
+            i = first
+            if i == len(hand) or hand[i] != tile:
+                raise ValueError("Player.remove(tile): tile not in hand")
+        del hand[i]
+        self.tracker.remove(tile.cmpval)
+
     def discard(self, tile):
         """Discard a tile in hand and add to player's discards."""
-        self.hand.remove(tile)
+        self.remove(tile)
         self.discards.append(tile)
+        self.discardmask |= 1 << tile.cmpval
+        self.missed = 0
         self.clear_draw()
 
     def clear_draw(self):
@@ -46,13 +116,18 @@ class Player:
     def clear(self):
         """Resets attributes for new hand.  Clears tiles in hand."""
         self.hand = []
+        self.tracker = pyriichi.scoring.WaitTracker()
+        self.count = self.tracker.count
         self.sets = []
         self.discards = []
+        self.discardmask = 0
+        self.missed = 0
+        self.riichi_missed = 0
         self.riichi = 0
         self.double_riichi = 0
         self.ippatsu = 0
 
-    def riichi(self, double=False):
+    def declare_riichi(self, double=False):
         """Declare riichi.  Raises RiichiError if riichi is already declared.
 
         double
@@ -61,7 +136,7 @@ class Player:
         """
         if self.riichi:
             raise RiichiError("already declared")
-        if self.points >= 1000:
+        if self.points < 1000:
             raise RiichiError("not enough points")
         self.points -= 1000
         self.riichi = 1
@@ -69,6 +144,44 @@ class Player:
         if double:
             self.double_riichi = 1
 
+    def snapshot(self):
+        """Returns the state of the player as a tuple, for restore().  It
+        holds the tiles themselves along with their flags, so restore() also
+        undoes flags set since, e.g. by a claim."""
+        try:
+            current_draw = self.current_draw
+        except AttributeError:
+            current_draw = None
+        tiles = self.hand + self.discards
+        for part in self.sets:
+            tiles.extend(part)
+        return (self.points, self.wind, tuple(self.hand),
+                tuple([tuple(part) for part in self.sets]),
+                tuple(self.discards), self.discardmask, self.missed,
+                self.riichi_missed, self.riichi, self.double_riichi,
+                self.ippatsu, current_draw, self.tracker.snapshot(),
+                tuple(tiles), tuple([tile.flags for tile in tiles]))
+
+    def restore(self, state):
+        """Returns the player to a state from snapshot().  hand, sets and
+        discards stay the same lists."""
+        (self.points, self.wind, hand, sets, discards, self.discardmask,
+         self.missed, self.riichi_missed, self.riichi, self.double_riichi,
+         self.ippatsu, current_draw, tracker, tiles, flags) = state
+        self.hand[:] = hand
+        self.sets[:] = [list(part) for part in sets]
+        self.discards[:] = discards
+        self.tracker.restore(tracker)
+        if current_draw is None:
+            try:
+                del self.current_draw
+            except AttributeError:
+                pass
+        else:
+            self.current_draw = current_draw
+        for tile, value in zip(tiles, flags):
+            tile.flags = value
+
     def sort(self):
         """Sort player's hand in place."""
         pyriichi.scoring.sort(self.hand)
@@ -77,7 +190,60 @@ class Player:
         return pyriichi.scoring.iscomplete(self.hand)
 
     def waits(self):
-        return pyriichi.scoring.waits(self.hand)
+        return [pyriichi.scoring._CLASSES[x]
+                for x in pyriichi.scoring.frommask(self.waitmask())]
+
+    def waitmask(self):
+        """Returns scoring.waitmask() of player's hand, worked out again only
+        if the hand has changed (see scoring.WaitTracker)."""
+        return self.tracker.waitmask()
+
+    def miss(self, tile):
+        """Records that player let tile, another player's discard that
+        completes their hand, go by.  Player is temporarily furiten until
+        their next discard, or for the rest of the hand after riichi."""
+        self.missed = 1
+        if self.riichi:
+            self.riichi_missed = 1
+
+    @property
+    def permanent_furiten(self):
+        """True if any of player's waits is among their own discards."""
+        return bool(self.waitmask() & self.discardmask)
+
+    @property
+    def temporary_furiten(self):
+        """True if player let a winning discard go by since their last
+        discard."""
+        return bool(self.missed)
+
+    @property
+    def riichi_furiten(self):
+        """True if player let a winning discard go by after riichi."""
+        return bool(self.riichi_missed)
+
+    @property
+    def furiten(self):
+        """True if player may not win on a discard."""
+        return bool(self.missed or self.riichi_missed or
+                    self.waitmask() & self.discardmask)
+
+    def can_ron(self, tile):
+        """Returns True if tile completes player's hand and False otherwise.
+        Does not check for yaku."""
+        return bool(self.waitmask() >> tile.cmpval & 1)
+
+    def ukeire(self, visible=None):
+        """Returns scoring.ukeire() of player's hand: the shanten number after
+        each possible discard and the tiles that improve on it, with the
+        number of copies of each still unseen.
+
+        visible
+            the tiles seen outside player's hand, as a list of tiles or a
+            scoring.Count; wrap ids with scoring.Count(tiles.idcount(ids))
+
+        """
+        return pyriichi.scoring.ukeire(self.hand, visible, len(self.sets))
 
     def chi(self, tiles):
         """Form a declared chi with tiles in hand.  When taking a discard, the
@@ -91,7 +257,7 @@ class Player:
             set = []
             for tile in tiles:
                 tile.chi = 1
-                self.hand.remove(tile)
+                self.remove(tile)
                 set.append(tile)
             self.sets.append(set)
             self.clear_draw()
@@ -110,7 +276,7 @@ class Player:
             set = []
             for tile in tiles:
                 tile.pon = 1
-                self.hand.remove(tile)
+                self.remove(tile)
                 set.append(tile)
             self.sets.append(set)
             self.clear_draw()
@@ -131,13 +297,12 @@ class Player:
             set = []
             for tile in tiles:
                 tile.kan = 1
-                self.hand.remove(tile)
+                self.remove(tile)
                 set.append(tile)
             self.sets.append(set)
 
             tile = wall.take()
-            self.hand.append(tile)
-            self.sort()
+            self.add(tile)
             self.current_draw = tile
         else:
             raise ModelError("Player", "kan", str(tiles))
@@ -155,13 +320,12 @@ class Player:
             set = []
             for tile in tiles:
                 tile.ckan = 1
-                self.hand.remove(tile)
+                self.remove(tile)
                 set.append(tile)
             self.sets.append(set)
 
             tile = wall.take()
-            self.hand.append(tile)
-            self.sort()
+            self.add(tile)
             self.current_draw = tile
         else:
             raise ModelError("Player", "ckan", str(tiles))
@@ -174,56 +338,44 @@ class Player:
         wall
             Wall to draw replacement tile
 
+        Raises PlayerError if Player has no pon of tile.
+
         """
-        if self.can_addkan(tile):
-            self.hand.remove(tile)
-            for x in self.sets:
-                if (len(x) == 3 and x[0] == x[1] == x[3] == tile):
-                    break
-            for a in x:
-                del a.pon
-                a.kan = 1
-                a.addedkan = 1
-            x.append(tile)
-            tile.kan = 1
-            tile.addedkan = 1
+        for x in self.sets:
+            if len(x) == 3 and x[0] == x[1] == x[2] == tile:
+                break
+        else:
+            raise PlayerError("no pon to add " + repr(tile) + " to")
+        self.remove(tile)
+        for a in x:
+            del a.pon
+            a.kan = 1
+            a.addedkan = 1
+        x.append(tile)
+        tile.kan = 1
+        tile.addedkan = 1
+
+        tile = wall.take()
+        self.add(tile)
+        self.current_draw = tile
 
     def can_pon(self, tile):
         """Returns True if Player can pon tile and False otherwise."""
-        count = 0
-        for x in self.hand:
-            if x.cmpval == tile.cmpval:
-                count += 1
-            if count == 2:
-                return True
-        return False
+        return self.count[tile.cmpval] >= 2
 
     def can_kan(self, tile):
         """Returns True if Player can kan tile and False otherwise."""
-        count = 0
-        for x in self.hand:
-            if x.cmpval == tile.cmpval:
-                count += 1
-            if count == 3:
-                return True
-        return False
+        return self.count[tile.cmpval] >= 3
 
     def can_ckan(self):
         """Returns a list of lists of tiles with which the Player can declare
         concealed kan."""
-        count = pyriichi.scoring.tocount(self.hand)
-        possible = []
-        for tilenum, num in enumerate(count):
-            if num == 4:
-                possible.append(tilenum)
-
         result = []
-        for cmpval in possible:
-            tmp = []
-            for tile in self.hand:
-                if tile.cmpval == cmpval:
-                    tmp.append(tile)
-            result.append(tmp)
+        for cmpval, num in enumerate(self.count):
+            if num == 4:
+                # hand is sorted, so the kind's tiles follow all lower ones
+                i = sum(self.count[:cmpval])
+                result.append(self.hand[i:i + 4])
         return result
 
     def can_addkan(self, tile):
@@ -236,25 +388,19 @@ class Player:
 
     def can_chi(self, tile):
         """Returns number of chi Player can form with the tile."""
-        try:
-            tile.value
-        except AttributeError:
+        cmpval = tile.cmpval
+        value = pyriichi.tiles.VALUE[cmpval]
+        if not value:
             return 0
-        else:
-            val = tile.value
-            start = ["PINZU", "SOUZU", "MANZU"].index(tile.type) * 9
-            count = pyriichi.scoring.tocount(self.hand)[start:start + 9]
-            count[val - 1] += 1
-            a = 0
-            result = 0
-            for i in range(9):
-                if count[i] > 0:
-                    a += 1
-                    if a >= 3:
-                        result += 1
-                else:
-                    a = 0
-            return result
+        count = self.count
+        result = 0
+        if value >= 3 and count[cmpval - 2] and count[cmpval - 1]:
+            result += 1
+        if 2 <= value <= 8 and count[cmpval - 1] and count[cmpval + 1]:
+            result += 1
+        if value <= 7 and count[cmpval + 1] and count[cmpval + 2]:
+            result += 1
+        return result
 
 
 class PlayerError(Exception):
@@ -15,16 +15,27 @@ count
     list with each element corresponding to the number of that tile in the
     hand.  Note that information about red tiles are lost.  
 
+    Functions that take a hand in count representation take it as a Count,
+    which tocount() returns; they take any other hand as a list of tiles.
+    Wrap a plain list with Count(), and ids (see pyriichi.tiles) with
+    Count(tiles.idcount(ids)).
+
 """
 
 from __future__ import division
+import collections
 import math
+import operator
+import types
 
+import pyriichi.cache
 import pyriichi.tiles as tiles
 
 def sort(hand):
-    """Sort list of tiles in place."""
-    hand.sort(key=lambda x: x.cmpval)
+    """Sort list of tiles in place.  Same as hand.sort(), but faster."""
+    hand.sort(key=_CMPVAL)
+
+_CMPVAL = operator.attrgetter('cmpval')
 
 def tohand(*sets):
     """Converts hand representation from sets to hand.  Returns hand."""
@@ -35,64 +46,157 @@ def tohand(*sets):
     return hand
 
 def tocount(hand):
-    """Converts hand representation from hand to count.  Returns count."""
-    count = [0 for i in range(34)]
+    """Converts hand representation from hand to count.  Returns a Count."""
+    count = Count(_ZEROS)
     for tile in hand:
         count[tile.cmpval] += 1
     return count
 
-def makesets(hand):
-    """Make sets representations from hand.  Returns a list of lists of tiles.
+class Count(list):
+    """A hand in count representation.  Marks a list of 34 ints as a count
+    for the functions that take a hand either as a list of tiles or in count
+    representation.
+
+    count
+        iterable of the number of each tile, in cmpval order
+
     """
-    sort(hand)
-    possible = []
-    
-    if is7pairs(hand):
-        x = []
-        for i in range(7):
-            a, b = i * 2, i * 2 + 1
-            if not ispair(hand[a], hand[b]):
-                raise ScoringException("makesets", "not a pair:" + str(hand[a])
-                                       + str(hand[b]))
-            x.append([a, b])
-        possible.append(x)
-
-    _rmakesets(hand, [], possible)
-    return possible
-
-def _rmakesets(hand, used, possible):
-    """Recursive part of makesets()."""
-    if len(hand) < 1:
-        possible.append(used[:])
-        return
+    __slots__ = ()
 
-    sort(hand)
-    if has_kan(hand, hand[0]):
-        used.append(hand[:4])
-        hand = hand[4:]
-        _rmakesets(hand, used, possible)
-        hand.extend(used.pop())
+    def __init__(self, count):
+        list.__init__(self, count)
+        if len(self) != 34:
+            raise ScoringException(
+                "Count", "expected 34 items, got " + str(len(self)))
 
-    sort(hand)
-    if has_pon(hand, hand[0]):
-        used.append(hand[:3])
-        hand = hand[3:]
-        _rmakesets(hand, used, possible)
-        hand.extend(used.pop())
+_ZEROS = (0,) * 34
 
-    sort(hand)
-    if has_chi(hand, hand[0]):
-        used.append(hand[:3])
-        hand = hand[3:]
-        _rmakesets(hand, used, possible)
-        hand.extend(used.pop())
+class HandKey(tuple):
+    """Frozen, hashable key for a hand, for use in sets and as a dict key.
+    Holds the identity of each tile, sorted, so two hands have equal keys
+    if they hold the same tiles, red fives included.  Flags are ignored.
+
+    hand
+        list of tiles in hand representation
+
+    """
+    __slots__ = ()
+
+    def __new__(cls, hand):
+        return tuple.__new__(cls, sorted([tile.identity for tile in hand]))
+
+    def __repr__(self):
+        return 'HandKey(' + tuple.__repr__(self) + ')'
+
+def makesets(hand):
+    """Make sets representations from hand.  Returns a list of lists of tiles.
+
+    Every way of splitting hand into sets and one pair is returned, plus Seven
+    Pairs and 13 Orphans (as a single set).  If a tile in hand has the last
+    flag, each split is returned once for every set the last tile could
+    complete.  Splits are cached in decomposition_cache by count and winning
+    tile; the lists returned are always new and hold the tiles of hand.
 
+    """
     sort(hand)
-    if ispair(hand):
-        used.append(hand[:2])
-        hand = hand[2:]
-        _rmakesets(hand, used, possible)
-        hand.extend(used.pop())
+    count = tocount(hand)
+    last = None
+    for tile in hand:
+        if tile.flags & tiles.LAST:
+            last = tile.cmpval
+            break
+    key = (tuple(count), last)
+    shapes = decomposition_cache.get(key)
+    if shapes is None:
+        shapes = _makeshapes(count, last)
+        decomposition_cache[key] = shapes
+    return [_bindshape(hand, shape) for shape in shapes]
+
+def _makeshapes(count, last):
+    """Returns the splits of count for makesets() as a tuple of (sets, i)
+    pairs.  sets is a tuple of tuples of cmpvals, and i is the index of the
+    set holding the winning tile last, or None."""
+    splits = []
+    if sum(count) == 14:
+        if count.count(2) == 7:
+            splits.append([(x, x) for x, num in enumerate(count) if num])
+        if _is13orphan(count):
+            splits.append([tuple(x for x, num in enumerate(count)
+                                 for i in range(num))])
+    _rmakesets(count[:], 0, [], 0, splits)
+
+    shapes = []
+    for sets in splits:
+        sets = tuple(sets)
+        if last is None:
+            shapes.append((sets, None))
+            continue
+        seen = []
+        for i, set in enumerate(sets):
+            if last in set and set not in seen:
+                seen.append(set)
+                shapes.append((sets, i))
+    return tuple(shapes)
+
+def _rmakesets(count, i, used, pair, splits):
+    """Recursive part of makesets().  Takes a kan, pon, chi or pair starting
+    with the lowest tile left in count."""
+    while i < 34 and not count[i]:
+        i += 1
+    if i == 34:
+        if pair:
+            splits.append(used[:])
+        return
+    for set in _SETS[i]:
+        if len(set) == 2:
+            if pair:
+                continue
+        if all(count[x] >= set.count(x) for x in set):
+            for x in set:
+                count[x] -= 1
+            used.append(set)
+            _rmakesets(count, i, used, pair or len(set) == 2, splits)
+            used.pop()
+            for x in set:
+                count[x] += 1
+
+def _bindshape(hand, shape):
+    """Returns the split shape from _makeshapes() as lists of the tiles of
+    hand."""
+    sets, lastset = shape
+    pool = [[] for i in range(34)]
+    last = None
+    for tile in reversed(hand):
+        if lastset is not None and last is None and tile.flags & tiles.LAST:
+            last = tile
+        else:
+            pool[tile.cmpval].append(tile)
+    result = []
+    for i, set in enumerate(sets):
+        group = []
+        for x in set:
+            if i == lastset and last is not None and x == last.cmpval:
+                group.append(last)
+                last = None
+            else:
+                group.append(pool[x].pop())
+        result.append(group)
+    return result
+
+def _setshapes(i):
+    """Returns the kan, pon, chi and pair whose lowest tile is cmpval i."""
+    sets = [(i, i, i, i), (i, i, i)]
+    if i < 27 and i % 9 < 7:
+        sets.append((i, i + 1, i + 2))
+    sets.append((i, i))
+    return tuple(sets)
+
+# sets by lowest tile, for _rmakesets()
+_SETS = [_setshapes(i) for i in range(34)]
+decomposition_cache = pyriichi.cache.LRUCache(4096)
+# Results of score() and highest_score(), by _statekey().  Caching is off
+# while this is None; set it to a pyriichi.cache.LRUCache to turn it on.
+score_cache = None
 
 def has_pon(hand, tile):
     """Returns True if the tile can form a pon in the hand and False
@@ -153,6 +257,8 @@ def calc(fu, han, east, type, honba=0):
         of win.  Each portion is then rounded up to the nearest 100.  Honba
         points are then added.
 
+    Payments before honba are looked up in PAYMENTS.
+
     east
         1 if East wins, 0 otherwise
     type
@@ -161,30 +267,52 @@ def calc(fu, han, east, type, honba=0):
         number of repeat counters
 
     """
-    score = 0
-    # double yakuman
-    if han >= 26:
-        score = 16000
-    # yakuman
-    elif han >= 13:
-        score = 12000
-    # sanbaiman
-    elif han >= 11:
-        score = 6000
-    # baiman
-    elif han >= 8:
-        score = 4000
-    # haneman
-    elif han >= 6:
-        score = 3000
-    # mangan
-    elif han >= 5:
-        score = 2000
+    han, fu = _paykey(fu, han)
+    east = 1 if east else 0
+    try:
+        score = PAYMENTS[(han, fu, east, type)]
+    except KeyError:
+        if type not in ("ron", "tsumo"):
+            raise ScoringException("calc",
+                                   type + " is not a valid value for type")
+        score = _pay(han, fu, east, type)
+
+    if type == "ron":
+        return score + honba * 300
+    elif east:
+        return score + honba * 100
     else:
+        return (score[0] + honba * 100, score[1] + honba * 100)
+
+def calc_many(results):
+    """Returns a list of calc(*x) for each x in results.
+
+    results
+        sequence of (fu, han, east, type) or (fu, han, east, type, honba)
+        tuples
+
+    """
+    return [calc(*x) for x in results]
+
+def _paykey(fu, han):
+    """Returns (han, fu) as they index PAYMENTS.  Limit hands are given the
+    least han of their limit and fu 0; fu of other hands is rounded up to the
+    nearest 10, except for 25."""
+    if han < 5:
         # round fu to ceiling 10
         if fu != 25 and fu % 10 != 0:
             fu = math.ceil(fu / 10) * 10
-        # Calculate base score
+        return han, fu
+    for limit in _LIMITS:
+        if han >= limit:
+            return limit, 0
+
+def _pay(han, fu, east, type):
+    """Returns the payment for calc() before honba.  han and fu are as
+    returned by _paykey()."""
+    if han in _LIMITS:
+        score = _LIMITS[han]
+    else:
         score = fu * 2 ** (2 + han)
 
     def round(x):
@@ -192,24 +320,38 @@ def calc(fu, han, east, type, honba=0):
 
     if type == "ron":
         if east:
-            score *= 6
-        else:
-            score *= 4
-        score = round(score)
-        score += honba * 300
-        return score
-    elif type == "tsumo":
-        if east:
-            score *= 2
-            score = round(score)
-            score += honba * 100
-            return score
-        else:
-            score = (round(score) + (honba * 100), round(score * 2) + (honba *
-                                                                       100))
-            return score
-    else:
-        raise ScoringException("calc", type + " is not a valid value for type")
+            return round(score * 6)
+        return round(score * 4)
+    if east:
+        return round(score * 2)
+    return (round(score), round(score * 2))
+
+# base score for each limit, by least han
+_LIMITS = collections.OrderedDict([
+    (26, 16000),    # double yakuman
+    (13, 12000),    # yakuman
+    (11, 6000),     # sanbaiman
+    (8, 4000),      # baiman
+    (6, 3000),      # haneman
+    (5, 2000),      # mangan
+])
+
+def _paytable():
+    """Returns the dict for PAYMENTS."""
+    table = {}
+    keys = [(han, 0) for han in _LIMITS]
+    for han in range(5):
+        keys.append((han, 25))
+        keys.extend([(han, fu) for fu in range(20, 310, 10)])
+    for han, fu in keys:
+        for east in (0, 1):
+            for type in ("ron", "tsumo"):
+                table[(han, fu, east, type)] = _pay(han, fu, east, type)
+    return table
+
+# Payments before honba, indexed by (han, fu, east, type) as returned by
+# _paykey().  Payments outside the table are calculated as needed.
+PAYMENTS = types.MappingProxyType(_paytable())
 
 def matchtype(hand, *types, any=0):
     """Checks if all tiles in hand matches one type of the types provided.  If
@@ -235,19 +377,19 @@ def concealed(*sets):
     only one set, takes into account the last tile."""
     if len(sets) == 1:
         for tile in sets[0]:
-            if not (hasattr(tile, "last") and hasattr(tile."ron")):
+            if tile.flags & _WON != _WON:
                 return False
     else:
         for set in sets:
             for tile in set:
-                if hasattr(tile, "kan"):
-                    return False
-                if hasattr(tile, "pon"):
-                    return False
-                if hasattr(tile, "chi"):
+                if tile.flags & _OPEN:
                     return False
     return True
 
+# flags of the winning tile of a ron, and of tiles in declared open sets
+_WON = tiles.LAST | tiles.RON
+_OPEN = tiles.KAN | tiles.PON | tiles.CHI
+
 def counttile(list, tile):
     """Returns number of a tile in list."""
     num = 0
@@ -258,21 +400,16 @@ def counttile(list, tile):
 
 def nexttile(tile):
     """Returns the tile that comes after tile.  Used for dora."""
-    for suit in tiles.SUITS:
-        for i, x in enumerate(suit):
-            if isinstance(tile, x):
-                i += 1
-                if i >= len(suit):
-                    i = 0
-                return suit[i]()
+    return _CLASSES[tiles.DORA_SUCCESSOR[tile.cmpval]]()
 
 def is13orphan(hand):
     """Checks hand for 13 Orphans."""
     count = []
     for x in [tiles.P1, tiles.P9, tiles.S1, tiles.S9, tiles.M1, tiles.M9,
-              tiles.E, tiles.S, tiles.W, tiles.N, tiles.Wh, tiles.G, tiles.R]:
+              tiles.E, tiles.S, tiles.W, tiles.N, tiles.Wh, tiles.Gr,
+              tiles.Rd]:
         count.append(counttile(hand, x()))
-    if count.count(2) == 1 and count.count(1) == 13:
+    if count.count(2) == 1 and count.count(1) == 12:
         return True
     else:
         return False
@@ -297,75 +434,330 @@ def isnagashi(discards):
     return True
 
 def iscomplete(hand):
-    """Checks hand recursively for completeness. Wrapper for recursive
-    function.
+    """Checks hand for completeness.  Wrapper for _iscomplete().
 
     hand
-        list of tiles in hand representation
+        list of tiles or a Count
 
     """
-    # assemble hand as list representation
-    if total == 14:
-        if is13orphan(hand):
+    return _iscomplete(_ascount(hand))
+
+def _iscomplete(count):
+    """Checks hand for completeness with the per-suit agari tables.
+
+    count
+        list of tiles in count representation
+
+    """
+    if sum(count) == 14:
+        if count.count(2) == 7:
             return True
-        if is7pairs(hand):
+        if _is13orphan(count):
             return True
-    return _riscomplete(tocount(hand), [0 for i in range(34)])
+    pairs = 0
+    anypair = False
+    for start, size, table in _GROUPS:
+        flags = table.get(_suitkey(count, start, size), 0)
+        if not flags & _MELDS:
+            if not flags & _PAIR:
+                return False
+            pairs += 1
+        elif flags & _PAIR:
+            anypair = True
+    if pairs == 1:
+        return True
+    return pairs == 0 and anypair
 
-def _riscomplete(hand, store):
-    """Recursive function to check for hand completeness.  
+def _is13orphan(count):
+    """Checks count for 13 Orphans."""
+    total = 0
+    for i in _ORPHANS:
+        if not count[i]:
+            return False
+        total += count[i]
+    return total == 14 and sum(count) == 14
+
+def _suitkey(count, start, size):
+    """Packs count[start:start + size] into an int, four bits per tile."""
+    key = 0
+    for i in range(start + size - 1, start - 1, -1):
+        key = key << 4 | count[i]
+    return key
+
+def _build_agari_table(size, chi):
+    """Returns a dict mapping every complete suit shape, packed as in
+    _suitkey(), to its flags.  _MELDS is set if the shape splits into sets
+    only, _PAIR if it splits into sets and one pair.  Shapes that are not
+    complete are not in the dict.
+
+    size
+        number of tiles in the suit
+    chi
+        True if chi may be formed in the suit
+
+    """
+    sets = []
+    for i in range(size):
+        sets.append(3 << 4 * i)
+        sets.append(4 << 4 * i)
+        if chi and i < size - 2:
+            sets.append(0x111 << 4 * i)
+    # a packed count has a slot over 4 iff adding 3 to it sets the high bit
+    carry = int('3' * size, 16)
+    overflow = int('8' * size, 16)
+
+    level = shapes = set([0])
+    for i in range(4):
+        level = set(x + y for x in level for y in sets
+                    if not (x + y + carry) & overflow)
+        shapes = shapes | level
+    table = dict.fromkeys(shapes, _MELDS)
+    for shape in shapes:
+        for i in range(size):
+            x = shape + (2 << 4 * i)
+            if not (x + carry) & overflow:
+                table[x] = table.get(x, 0) | _PAIR
+    return table
+
+_MELDS = 1
+_PAIR = 2
+_ORPHANS = (0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33)
+_SUITED = _build_agari_table(9, True)
+_HONORS = _build_agari_table(7, False)
+# (start, size, table) for pinzu, souzu, manzu, honors in count representation
+_GROUPS = ((0, 9, _SUITED), (9, 9, _SUITED), (18, 9, _SUITED),
+           (27, 7, _HONORS))
+
+def shanten(hand, melds=0):
+    """Returns the shanten number of hand: the number of tiles it needs to
+    exchange to reach tenpai.  0 is tenpai and -1 is a complete hand.  Regular
+    hands, Seven Pairs and 13 Orphans are all considered.
 
     hand
-        list of tiles in count representation currently being checked
-    store
-        list of tiles in count representation currently taken out
+        list of tiles or a Count; concealed tiles only
+    melds
+        number of declared sets
 
     """
-    total = sum(hand)
-    # is a pair
-    if total == 2:
-        if hand.count(2) == 1:
-            return True
-        else:
-            return False
-    # look for kan
-    for i, num in enumerate(hand):
-        if num == 4:
-            hand[i] = 0
-            store[i] = 4
-            if _riscomplete(hand, store):
-                return True
-            store[i] = 0
-            hand[i] = 4
-
-    # pon
-    for i, num in enumerate(hand):
-        if num >= 3:
-            hand[i] -= 3
-            store[i] += 3
-            if _riscomplete(hand, store):
-                return True
-            store[i] -= 3
-            hand[i] += 3
-    # chi
-    for i, num in enumerate(hand[:26]):
-        if i % 9 <= 7:
-            if hand[i] >= 1 and hand[i + 1] >= 1 and hand[i + 2] >= 1:
-                hand[i] -= 1
-                hand[i + 1] -= 1
-                hand[i + 2] -= 1
-                store[i] += 1
-                store[i + 1] += 1
-                store[i + 2] += 1
-                if _riscomplete(hand, store):
-                    return True
-                store[i] -= 1
-                store[i + 1] -= 1
-                store[i + 2] -= 1
-                hand[i] += 1
-                hand[i + 1] += 1
-                hand[i + 2] += 1
-    return False
+    count = _ascount(hand)
+    result = _regular_shanten(count, melds)
+    if not melds and sum(count) >= 13:
+        result = min(result, _7pairs_shanten(count), _13orphan_shanten(count))
+    return result
+
+def _ascount(hand):
+    """Returns hand, a list of tiles or a Count, in count representation.
+    Raises ScoringException for anything else, such as a plain list of ids
+    or counts."""
+    if isinstance(hand, Count):
+        return hand
+    if hand and not isinstance(hand[0], tiles.Tile):
+        raise ScoringException(
+            "count", "expected a list of tiles or a Count, got a list of " +
+            type(hand[0]).__name__)
+    return tocount(hand)
+
+def _regular_shanten(count, melds):
+    """Returns the shanten number of count as sets and a pair."""
+    # shapes[p] is a list of (sets, partial sets); p is 1 if a pair is taken
+    shapes = ([(melds, 0)], [])
+    for start, size, chi, memo in _SHAPE_GROUPS:
+        shapes = _combine(shapes, _groupshapes(count, start, size, chi, memo))
+    return _shapes_shanten(shapes)
+
+def _combine(shapes, group):
+    """Returns the shapes of two disjoint parts of a hand taken together,
+    given the shapes of each as returned by _groupshapes()."""
+    new = ([], [])
+    for p, q in ((0, 0), (0, 1), (1, 0)):
+        for m, t in shapes[p]:
+            for m2, t2 in group[q]:
+                _addshape(new[p + q], m + m2, t + t2)
+    return new
+
+def _shapes_shanten(shapes):
+    """Returns the shanten number of the best of shapes."""
+    result = 8
+    for p in (0, 1):
+        for m, t in shapes[p]:
+            result = min(result, 8 - 2 * m - min(t, 4 - m) - p)
+    return result
+
+def ukeire(hand, visible=None, melds=0):
+    """Finds, for every tile that can be discarded from hand, the shanten
+    number after the discard and the tiles that would then lower it.
+    Returns a list of (discard, shanten, improving), one for each distinct
+    tile in hand in cmpval order.  discard is a cmpval and improving maps
+    the cmpval of each tile that lowers shanten to the number of copies
+    still unseen.
+
+    Only the group holding the drawn tile is looked at again for each draw;
+    the rest of the hand is combined once per discard.
+
+    hand
+        list of tiles or a Count; concealed tiles only, usually 14 of them
+        counting the drawn tile
+    visible
+        the tiles seen outside hand, e.g. discards, melds and dora
+        indicators, as a list of tiles or a Count
+    melds
+        number of declared sets
+
+    """
+    count = list(_ascount(hand))
+    if visible is None:
+        visible = [0] * 34
+    else:
+        visible = _ascount(visible)
+    special = not melds and sum(count) >= 14
+    unseen = [max(0, 4 - count[i] - visible[i]) for i in range(34)]
+
+    result = []
+    for discard in range(34):
+        if not count[discard]:
+            continue
+        count[discard] -= 1
+        groups = [_groupshapes(count, start, size, chi, memo)
+                  for start, size, chi, memo in _SHAPE_GROUPS]
+        # the shapes of everything but each group
+        others = []
+        for g in range(4):
+            shapes = ([(melds, 0)], [])
+            for h in range(4):
+                if h != g:
+                    shapes = _combine(shapes, groups[h])
+            others.append(shapes)
+        base = _shapes_shanten(_combine(others[0], groups[0]))
+        if special:
+            pairs = kinds = orphans = orphanpair = 0
+            for i, num in enumerate(count):
+                if num:
+                    kinds += 1
+                    pairs += num >= 2
+                    if i in _ORPHANS:
+                        orphans += 1
+                        orphanpair = orphanpair or num >= 2
+            base = min(base, 6 - pairs + max(0, 7 - kinds),
+                       13 - orphans - orphanpair)
+
+        improving = {}
+        for i in range(34):
+            if count[i] >= 4:
+                continue
+            g = min(i // 9, 3)
+            start, size, chi, memo = _SHAPE_GROUPS[g]
+            count[i] += 1
+            x = _shapes_shanten(
+                _combine(others[g], _groupshapes(count, start, size, chi,
+                                                 memo)))
+            count[i] -= 1
+            if special:
+                new = not count[i]
+                pair = count[i] == 1
+                x = min(x, 6 - pairs - pair + max(0, 7 - kinds - new))
+                if i in _ORPHANS:
+                    x = min(x, 13 - orphans - new - (orphanpair or pair))
+                else:
+                    x = min(x, 13 - orphans - orphanpair)
+            if x < base:
+                improving[i] = unseen[i]
+        result.append((discard, base, improving))
+        count[discard] += 1
+    return result
+
+def _7pairs_shanten(count):
+    """Returns the shanten number of count as Seven Pairs."""
+    pairs = kinds = 0
+    for num in count:
+        if num:
+            kinds += 1
+            if num >= 2:
+                pairs += 1
+    return 6 - pairs + max(0, 7 - kinds)
+
+def _13orphan_shanten(count):
+    """Returns the shanten number of count as 13 Orphans."""
+    kinds = 0
+    pair = 0
+    for i in _ORPHANS:
+        if count[i]:
+            kinds += 1
+            if count[i] >= 2:
+                pair = 1
+    return 13 - kinds - pair
+
+def _groupshapes(count, start, size, chi, memo):
+    """Returns the ways count[start:start + size] splits into sets and partial
+    sets, as a tuple indexed by whether a pair is taken.  Each item is a
+    tuple of the (sets, partial sets) that are not dominated by another.
+    Results are memoized by _suitkey() in memo."""
+    key = _suitkey(count, start, size)
+    try:
+        return memo[key]
+    except KeyError:
+        return _rgroupshapes(count[start:start + size], key, chi, memo)
+
+def _rgroupshapes(count, key, chi, memo):
+    """Recursive part of _groupshapes().  Takes a set, pair or partial set
+    containing the lowest tile left in count and combines it with the
+    (memoized) shapes of the rest."""
+    try:
+        return memo[key]
+    except KeyError:
+        pass
+    size = len(count)
+    i = 0
+    while i < size and not count[i]:
+        i += 1
+    if i == size:
+        memo[key] = result = (((0, 0),), ())
+        return result
+
+    # (tiles taken, sets, partial sets, pair)
+    moves = [((i,), 0, 0, 0)]
+    if count[i] >= 2:
+        moves.append(((i, i), 0, 0, 1))
+        moves.append(((i, i), 0, 1, 0))
+    if count[i] >= 3:
+        moves.append(((i, i, i), 1, 0, 0))
+    if chi:
+        for j in (i + 1, i + 2):
+            if j < size and count[j]:
+                moves.append(((i, j), 0, 1, 0))
+        if i + 2 < size and count[i + 1] and count[i + 2]:
+            moves.append(((i, i + 1, i + 2), 1, 0, 0))
+
+    shapes = ([], [])
+    for taken, dm, dt, dp in moves:
+        rest = key
+        for j in taken:
+            count[j] -= 1
+            rest -= 1 << 4 * j
+        sub = _rgroupshapes(count, rest, chi, memo)
+        for j in taken:
+            count[j] += 1
+        for p in range(2 - dp):
+            for m, t in sub[p]:
+                m += dm
+                # more than four sets and partial sets are never useful
+                _addshape(shapes[p + dp], m, min(t + dt, max(4 - m, 0)))
+    memo[key] = result = (tuple(shapes[0]), tuple(shapes[1]))
+    return result
+
+def _addshape(shapes, m, t):
+    """Adds (m, t) to the list shapes unless it is dominated, removing any
+    items that it dominates."""
+    for m2, t2 in shapes:
+        if m2 >= m and t2 >= t:
+            return
+    shapes[:] = [x for x in shapes if x[0] > m or x[1] > t]
+    shapes.append((m, t))
+
+_SUIT_SHAPES = {}
+_HONOR_SHAPES = {}
+# (start, size, chi, memo) for pinzu, souzu, manzu, honors
+_SHAPE_GROUPS = ((0, 9, True, _SUIT_SHAPES), (9, 9, True, _SUIT_SHAPES),
+                 (18, 9, True, _SUIT_SHAPES), (27, 7, False, _HONOR_SHAPES))
 
 def ischi(set):
     """Tests if the given list of tiles form a chi.  If it does, returns the
@@ -409,15 +801,321 @@ def waits(hand):
     an empty list.
     
     """
-    waits = []
-    for suit in SUITS:
-        for tile in suit:
-            temp = hand[:]
-            temp.append(tile())
-            sort(temp)
-            if iscomplete(temp):
-                waits.append(tile)
-    return waits
+    return [_CLASSES[x] for x in frommask(waitmask(hand))]
+
+def waitmask(hand):
+    """Finds the waits of hand in one pass.  Returns an int with bit n set if
+    the tile with cmpval n completes the hand.  A tile of which the hand
+    already holds all four is never a wait.
+
+    hand
+        list of tiles or a Count
+
+    """
+    count = _ascount(hand)
+    mask = _regularwaits([_suitkey(count, start, size)
+                          for start, size, table in _GROUPS])
+    if sum(count) == 13:
+        if count.count(2) == 6 and count.count(1) == 1:
+            mask |= 1 << count.index(1)
+        if sum([count[i] for i in _ORPHANS]) == 13:
+            mask |= _13orphanwaits(count)
+    return mask
+
+def _regularwaits(keys):
+    """Returns the waits of a hand as sets and a pair, as a mask as from
+    waitmask().  keys holds the _suitkey() of each group in _GROUPS."""
+    flags = [table.get(key, 0)
+             for key, (start, size, table) in zip(keys, _GROUPS)]
+    mask = 0
+    for g, (start, size, table) in enumerate(_GROUPS):
+        # the other groups must be complete, with at most one pair among them
+        forced = 0
+        anypair = False
+        for h, x in enumerate(flags):
+            if h == g:
+                continue
+            if not x:
+                break
+            if not x & _MELDS:
+                forced += 1
+            elif x & _PAIR:
+                anypair = True
+        else:
+            if forced > 1:
+                continue
+            melds, pair = _keywaits(keys[g], size, table)
+            if forced or anypair:
+                mask |= melds << start
+            if not forced:
+                mask |= pair << start
+    return mask
+
+def _13orphanwaits(count):
+    """Returns the 13 Orphans waits of count, which holds 13 orphans, as a
+    mask as from waitmask()."""
+    mask = 0
+    for i in _ORPHANS:
+        count[i] += 1
+        if _is13orphan(count):
+            mask |= 1 << i
+        count[i] -= 1
+    return mask
+
+def frommask(mask):
+    """Returns the list of cmpvals whose bits are set in mask."""
+    result = []
+    i = 0
+    while mask:
+        if mask & 1:
+            result.append(i)
+        mask >>= 1
+        i += 1
+    return result
+
+def _groupwaits(count, start, size, table):
+    """Returns (melds, pair), masks of the tiles that complete
+    count[start:start + size] as sets only and as sets and a pair, with bit 0
+    for count[start].  Results are memoized by _suitkey()."""
+    return _keywaits(_suitkey(count, start, size), size, table)
+
+def _keywaits(key, size, table):
+    """_groupwaits() of the group whose _suitkey() is key."""
+    memo = _WAITS[size]
+    try:
+        return memo[key]
+    except KeyError:
+        pass
+    melds = pair = 0
+    for i in range(size):
+        if key >> 4 * i & 15 < 4:
+            x = table.get(key + (1 << 4 * i), 0)
+            if x & _MELDS:
+                melds |= 1 << i
+            if x & _PAIR:
+                pair |= 1 << i
+    memo[key] = result = (melds, pair)
+    return result
+
+# memos for _groupwaits(), by group size
+_WAITS = {9: {}, 7: {}}
+_CLASSES = [tile for suit in tiles.SUITS for tile in suit]
+
+
+class WaitTracker:
+    """Keeps waitmask() of a hand up to date as tiles are added and removed
+    one at a time.  Each group (pinzu, souzu, manzu, honors) is kept as its
+    _suitkey(), so a change only repacks the changed tile's group, and the
+    mask is only worked out again when asked for after the hand changed.  A
+    hand that changes and changes back, as on tsumogiri, reuses its mask.
+
+    Attributes
+        count
+            the hand as a Count.  Change it only through add() and remove().
+
+    """
+    def __init__(self, hand=None):
+        """hand
+            starting hand as for waitmask(); defaults to no tiles
+
+        """
+        self.count = Count(_ZEROS)
+        self.keys = [0] * len(_GROUPS)
+        self.total = 0
+        self.pairs = 0
+        self.singles = 0
+        self.orphans = 0
+        self.mask = 0
+        self.maskkeys = tuple(self.keys)
+        if hand is not None:
+            for cmpval, num in enumerate(_ascount(hand)):
+                for i in range(num):
+                    self.add(cmpval)
+
+    def add(self, cmpval):
+        """Adds a tile of kind cmpval."""
+        num = self.count[cmpval]
+        self.count[cmpval] = num + 1
+        self._recount(num, num + 1)
+        self.total += 1
+        if _ISORPHAN[cmpval]:
+            self.orphans += 1
+        self.keys[_GROUPOF[cmpval]] += _PLACE[cmpval]
+
+    def remove(self, cmpval):
+        """Removes a tile of kind cmpval."""
+        num = self.count[cmpval]
+        self.count[cmpval] = num - 1
+        self._recount(num, num - 1)
+        self.total -= 1
+        if _ISORPHAN[cmpval]:
+            self.orphans -= 1
+        self.keys[_GROUPOF[cmpval]] -= _PLACE[cmpval]
+
+    def snapshot(self):
+        """Returns the state of the tracker, for restore()."""
+        return (tuple(self.count), tuple(self.keys), self.total, self.pairs,
+                self.singles, self.orphans, self.mask, self.maskkeys)
+
+    def restore(self, state):
+        """Returns the tracker to a state from snapshot().  count stays the
+        same list."""
+        (count, keys, self.total, self.pairs, self.singles, self.orphans,
+         self.mask, self.maskkeys) = state
+        self.count[:] = count
+        self.keys[:] = keys
+
+    def _recount(self, old, new):
+        """Updates the numbers of pairs and single tiles for a kind whose
+        count goes from old to new."""
+        if old == 2:
+            self.pairs -= 1
+        elif old == 1:
+            self.singles -= 1
+        if new == 2:
+            self.pairs += 1
+        elif new == 1:
+            self.singles += 1
+
+    def waitmask(self):
+        """Returns waitmask() of the hand."""
+        keys = tuple(self.keys)
+        if keys == self.maskkeys:
+            return self.mask
+        mask = _regularwaits(keys)
+        if self.total == 13:
+            if self.pairs == 6 and self.singles == 1:
+                mask |= 1 << self.count.index(1)
+            if self.orphans == 13:
+                mask |= _13orphanwaits(self.count)
+        self.mask = mask
+        self.maskkeys = keys
+        return mask
+
+# group of each cmpval in _GROUPS, and the value of one of its tiles in the
+# group's _suitkey()
+_GROUPOF = [g for g, (start, size, table) in enumerate(_GROUPS)
+            for i in range(size)]
+_PLACE = [1 << 4 * i for start, size, table in _GROUPS for i in range(size)]
+_ISORPHAN = [i in _ORPHANS for i in range(34)]
+
+class _Summary:
+    """What score() needs to know about sets, gathered in one pass over the
+    tiles.  Sorts each set in place.
+
+    Attributes
+        hand
+            all tiles, sorted as by tohand()
+        count
+            count representation of hand
+        kinds
+            'chi', 'pon', 'kan', 'pair' or None for each set
+        lows
+            lowest tile of each set
+        types
+            type shared by all tiles of each set, or None
+        terminals
+            for each set, True if it holds a terminal
+        lasts
+            for each set, a mask of the positions of tiles with the last flag
+        winning
+            for each set, True if every tile has the last and ron flags, as
+            concealed() finds for a single set
+        concealed
+            concealed(*sets)
+        suits
+            set of the tiles.SUIT_INDEX of the numbered tiles in hand
+        terminal, green
+            number of terminals and of green tiles
+        outside
+            number of terminals and honors
+        leading
+            number of terminals and honors before the first simple in hand
+        last
+            first tile in hand with the last flag, or None
+        wintype
+            type of win, as found by score()
+
+    """
+    def __init__(self, sets):
+        self.kinds = []
+        self.lows = []
+        self.types = []
+        self.terminals = []
+        self.lasts = []
+        self.winning = []
+        opened = False
+        hand = []
+        for part in sets:
+            sort(part)
+            low = part[0]
+            type = low.type
+            same = True
+            terminal = False
+            winning = True
+            last = 0
+            for i, tile in enumerate(part):
+                if tile.type != type:
+                    type = None
+                if tile.cmpval != low.cmpval:
+                    same = False
+                if tiles.IS_TERMINAL[tile.cmpval]:
+                    terminal = True
+                flags = tile.flags
+                if flags & tiles.LAST:
+                    last |= 1 << i
+                if flags & _WON != _WON:
+                    winning = False
+                if flags & _OPEN:
+                    opened = True
+            kind = None
+            if same:
+                kind = _KINDS.get(len(part))
+            elif (len(part) == 3 and type in ('PINZU', 'SOUZU', 'MANZU') and
+                  low.value + 2 == part[1].value + 1 == part[2].value):
+                kind = 'chi'
+            self.kinds.append(kind)
+            self.lows.append(low)
+            self.types.append(type)
+            self.terminals.append(terminal)
+            self.lasts.append(last)
+            self.winning.append(winning)
+            hand.extend(part)
+        if len(sets) == 1:
+            self.concealed = self.winning[0]
+        else:
+            self.concealed = not opened
+
+        sort(hand)
+        self.hand = hand
+        self.count = count = [0] * 34
+        self.last = None
+        self.wintype = ''
+        for tile in hand:
+            count[tile.cmpval] += 1
+            if not self.wintype:
+                if tile.flags & tiles.RON:
+                    self.wintype = 'ron'
+                elif not tile.flags & tiles.TSUMO:
+                    self.wintype = 'tsumo'
+            if self.last is None and tile.flags & tiles.LAST:
+                self.last = tile
+
+        self.suits = set([tiles.SUIT_INDEX[i] for i in range(27) if count[i]])
+        self.terminal = sum([count[i] for i in _TERMINALS])
+        self.green = sum([count[i] for i in _GREENS])
+        self.outside = len(hand) - sum([count[i] for i in _SIMPLES])
+        self.leading = 0
+        for i in range(34):
+            if count[i] and tiles.IS_SIMPLE[i]:
+                break
+            self.leading += count[i]
+
+_KINDS = {2: 'pair', 3: 'pon', 4: 'kan'}
+# cmpvals of terminals, green tiles and simples
+_TERMINALS = [i for i in range(34) if tiles.IS_TERMINAL[i]]
+_GREENS = [i for i in range(34) if tiles.IS_GREEN[i]]
+_SIMPLES = [i for i in range(34) if tiles.IS_SIMPLE[i]]
 
 def score(east, winds, *sets, honba=0, bonus=[], dora=[], ura=[]):
     """Returns (score, yaku), where score is the score and yaku is the list of
@@ -433,6 +1131,8 @@ def score(east, winds, *sets, honba=0, bonus=[], dora=[], ura=[]):
     Kaihou, Riichi, Ippatsu, Double Riichi should be added to bonus.  Dora
     indicator tiles should be added to dora and ura-dora to ura.
 
+    If score_cache is set, results are memoized there.
+
     east 
         1 if East wins, 0 otherwise
     winds
@@ -460,18 +1160,25 @@ def score(east, winds, *sets, honba=0, bonus=[], dora=[], ura=[]):
         list of ura-dora indicators
 
     """ 
+    if score_cache is None:
+        return _score(east, winds, sets, honba, bonus, dora, ura)
+    key = _statekey(east, winds, None, sets, honba, bonus, dora, ura)
+    return _cached(key, _score, east, winds, sets, honba, bonus, dora, ura)
+
+def _score(east, winds, sets, honba, bonus, dora, ura):
+    """Does the work of score().  The tiles are looked at once, to build a
+    _Summary; every yaku and the fu are then read off the summary."""
     # Nagashi Mangan
     if 'nagashi mangan' in bonus:
         return calc(20, 5, east, 'tsumo', honba), ['nagashi mangan']
 
-    type = ''
-    for tile in tohand(*sets):
-        if hasattr(tile, "ron"):
-            type = 'ron'
-            break
-        if not hasattr(tile, "tsumo"):
-            type = 'tsumo'
-            break
+    summary = _Summary(sets)
+    type = summary.wintype
+    hand = summary.hand
+    count = summary.count
+    kinds = summary.kinds
+    lows = summary.lows
+    hidden = summary.concealed
 
     # Blessing of Heaven/Earth/Man
     if 'tenhou' in bonus:
@@ -481,167 +1188,90 @@ def score(east, winds, *sets, honba=0, bonus=[], dora=[], ura=[]):
     elif 'renhou' in bonus:
         return calc(20, 13, east, type, honba), ['renhou']
 
+    winds3 = winds2 = dragons3 = honors = 0
+    for part, settype in zip(sets, summary.types):
+        if settype == 'WINDS':
+            honors += 1
+            if len(part) >= 3:
+                winds3 += 1
+            elif len(part) == 2:
+                winds2 += 1
+        elif settype == 'DRAGONS':
+            honors += 1
+            if len(part) >= 3:
+                dragons3 += 1
     # Big Four Winds
-    count = 0
-    for x in sets:
-        if len(x) >=3 and matchtype(x, 'WINDS'):
-            count += 1
-    if count == 4:
+    if winds3 == 4:
         return calc(20, 26, east, type, honba), ['dai suushii']
-
     # Little Four Winds
-    count = 0
-    pair = 0
-    for x in sets:
-        if matchtype(x, "WINDS"):
-            if len(x) >= 3:
-                count += 1
-            elif len(x) == 2:
-                pair += 1
-    if count == 3 and pair == 1:
+    if winds3 == 3 and winds2 == 1:
         return calc(20, 13, east, type, honba), ['shou suushii']
-
     # Big Three Dragons
-    count = 0
-    for x in sets:
-        if len(x) >= 3 and matchtype(x, 'DRAGONS'):
-            count += 1
-    if count == 3:
+    if dragons3 == 3:
         return calc(20, 13, east, type, honba), ['dai sangen']
-
     # All Honors
-    count = 0
-    for x in sets:
-        if matchtype(x, "WINDS", "DRAGONS"):
-            count += 1
-    if count == 5:
+    if honors == 5:
         return calc(20, 13, east, type, honba), ['tsuu iisou']
-
     # All Terminals
-    x = 0
-    for set in sets:
-        for tile in set:
-            if not hasattr(tile, "terminal"):
-                x = 1
-                break
-    if not x:
+    if summary.terminal == len(hand):
         return calc(20, 13, east, type, honba), ['chinrouto']
-
     # All Green
-    x = 0
-    for set in sets:
-        for tile in set:
-            if not hasattr(tile, "green"):
-                x = 1
-                break
-    if not x:
+    if summary.green == len(hand):
         return calc(20, 13, east, type, honba), ['ryuu iisou']
-
     # Four Kongs
-    count = 0
-    for x in sets:
-        if len(x) == 4:
-            count += 1
-    if count == 4:
+    if [len(part) for part in sets].count(4) == 4:
         return calc(20, 13, east, type, honba), ['suu kan tsu']
 
     # Four Concealed Pungs
-    han = 13
-    count = 0
-    if concealed(*sets):
-        for set in sets:
-            if (counttile(set, set[0]) == len(set) and len(set) >= 3 and
-            concealed(set)):
-                count += 1
-                # win on pair
-                if len(set) == 2:
-                    if hasattr(set[0], "last"):
-                        han += 13
-                    if hasattr(set[1], "last"):
-                        han += 13
-    if count == 4:
-        return calc(20, han, east, type, honba), ['suu ankou']
+    if hidden:
+        pungs = 0
+        for kind, winning in zip(kinds, summary.winning):
+            if kind in ('pon', 'kan') and winning:
+                pungs += 1
+        if pungs == 4:
+            return calc(20, 13, east, type, honba), ['suu ankou']
+
+    flush = None
+    if len(summary.suits) == 1 and not summary.outside - summary.terminal:
+        flush = list(summary.suits)[0]
+    last = summary.last
 
     # Nine Gates
-    han = 0
-    temp = tohand(*sets)
-    i = 0
-    while i < len(temp):
-        if temp[i].type in ['DRAGONS', 'WINDS']:
-            temp.pop(i)
-        else:
-            i += 1
-    values = [tile.value for tile in temp]
-    if (matchtype(tohand(*sets), "PINZU", "SOUZU", "MANZU") and 
-    values.count(1) >= 3 and 
-    values.count(2) >= 1 and
-    values.count(3) >= 1 and
-    values.count(4) >= 1 and
-    values.count(5) >= 1 and
-    values.count(6) >= 1 and
-    values.count(7) >= 1 and
-    values.count(8) >= 1 and
-    values.count(9) >= 3):
-        han += 13
-        for i, tile in enumerate(tohand(*sets)):
-            if hasattr(tile, "last"):
-                values.pop(i)
-                break
-        if (values.count(1) == 3 and values.count(2) == 1 and 
-            values.count(3) == 1 and values.count(4) == 1 and 
-            values.count(5) == 1 and values.count(6) == 1 and 
-            values.count(7) == 1 and values.count(8) == 1 and 
-            values.count(9) == 3):
-            han += 13
-    if han > 0:
-        return calc(20, han, east, type, honba), ['chuuren pooto']
+    if flush is not None:
+        start = flush * 9
+        values = count[start:start + 9]
+        if values[0] >= 3 and values[8] >= 3 and min(values) >= 1:
+            han = 13
+            if last is not None:
+                values[last.cmpval - start] -= 1
+                if values == [3, 1, 1, 1, 1, 1, 1, 1, 3]:
+                    han += 13
+            return calc(20, han, east, type, honba), ['chuuren pooto']
 
     # Thirteen Orphans
-    han = 0
-    hand = tohand(*sets)
-    if is13orphan(hand):
-        han += 13
-        for tile in hand:
-            if hasattr(tile, "last"):
-                hand.remove(tile)
-                count = []
-                for x in [tiles.P1, tiles.P9, tiles.S1, tiles.S9, tiles.M1,
-                          tiles.M9, tiles.E, tiles.S, tiles.W, tiles.N,
-                          tiles.Wh, tiles.G, tiles.R]:
-                    count.append(counttile(hand, x()))
-                if count.count(1) == 13:
-                    han += 13
-                break
-    if han > 0:
+    orphans = [count[x] for x in _ORPHANS]
+    if orphans.count(2) == 1 and orphans.count(1) == 12:
+        han = 13
+        if last is not None:
+            if last.cmpval in _ORPHANS:
+                orphans[_ORPHANS.index(last.cmpval)] -= 1
+            if orphans.count(1) == 13:
+                han += 13
         return calc(20, han, east, type, honba), ['kokushi musou']
 
     # Regular Hand Scoring ###################################################
     fu = han = 0
     yaku = []
     for x in bonus:
-        if x == 'riichi':
-            han += 1
-            yaku.append(x)
-        elif x == 'ippatsu':
-            han += 1
-            yaku.append(x)
-        elif x == 'daburu riichi':
-            han += 1
-            yaku.append(x)
-        elif x == 'rinchan kaihou':
-            han += 1
-            yaku.append(x)
-        elif x == 'chan kan':
-            han += 1
-            yaku.append(x)
-        elif x == 'haitei':
+        if x in ('riichi', 'ippatsu', 'daburu riichi', 'rinchan kaihou',
+                 'chan kan', 'haitei'):
             han += 1
             yaku.append(x)
     # Full Flush
-    if matchtype(tohand(*sets), "PINZU", "SOUZU", "MANZU"):
+    if flush is not None:
         han += 5
         yaku.append('chinitsu')
-        if concealed(*sets):
+        if hidden:
             han += 1
 
     # Twice Pure Double Chi
@@ -649,328 +1279,221 @@ def score(east, winds, *sets, honba=0, bonus=[], dora=[], ura=[]):
     # extra han is added for a total of 3 han.
 
     # Terminals in All Sets
-    count = 0
-    switch = False  # don't want this for all terminal hands
-    for set in sets:
-        for tile in set:
-            try:
-                tile.terminal
-                count += 1
-                if not switch and ischi(set):
-                    switch = True
+    if summary.terminals.count(True) == 4:
+        for kind, terminal in zip(kinds, summary.terminals):
+            if terminal and kind == 'chi':
+                han += 2
+                yaku.append('junchan taiyai')
+                if hidden:
+                    han += 1
                 break
-            except AttributeError:
-                pass
-    if count == 4 and switch:
-        han += 2
-        yaku.append('junchan taiyai')
-        if concealed(*sets):
-            han += 1
 
     # All Terminals and Honors
-    count = 0
-    for tile in tohand(*sets):
-        try:
-            if tile.type in ['DRAGONS', 'WINDS'] or tile.terminal:
-                count += 1
-        except AttributeError:
-            break
-    if count == 14:
+    if summary.leading == 14:
         han += 2
         yaku.append('honroutou')
 
     # Little Three Dragons
-    temp = tocount(tohand(*sets))[31:33]
-    try:
-        temp.remove(2)
-    except ValueError:
-        pass
-    else:
-        if temp[0] >= 3 and temp[1] >= 3:
-            han += 2
-            yaku.append('shou sangen')
+    # Only a pair of White or Green Dragons is looked for.
+    white, green, red = count[31:34]
+    if (white == 2 and green >= 3 or green == 2 and white >= 3) and red >= 3:
+        han += 2
+        yaku.append('shou sangen')
 
     # Half Flush
-    temp = tohand(*sets)
-    i = 0
-    while i < len(temp):
-        if temp[i].type in ['WINDS', 'DRAGONS']:
-            temp.pop(i)
-        else:
-            i += 1
-    if matchtype(temp, temp[0].type):
+    if len(summary.suits) == 1:
         han += 2
         yaku.append('honitsu')
 
     # All Pungs
-    temp = tocount(tohand(*sets))
-    if temp.count(3) + temp.count(4) == 4:
+    if count.count(3) + count.count(4) == 4:
         han += 2
         yaku.append('toitoi hou')
 
     # Three Kongs
-    if tocount(tohand(*sets)).count(4) == 3:
+    if count.count(4) == 3:
         han += 2
         yaku.append('san kan tsu')
     
     # Three Concealed Pungs
-    count = 0
-    for set in sets:
-        if concealed(*sets) and ispon(set) or iskan(set):
-            count += 1
-    if count >= 3:
+    pungs = kinds.count('kan')
+    if hidden:
+        pungs += kinds.count('pon')
+    if pungs >= 3:
         han += 2
         yaku.append('san ankou')
 
     # Triple Pung
-    temp = []
-    # Isolate only numbered tiles
-    for set in sets:
-        if ispon(set) or iskan(set) and set[0] not in ["DRAGONS", "WINDS"]:
-            temp.append(set[0])
-    if len(temp) >= 3:
+    pons = [low for kind, low in zip(kinds, lows) if kind in ('pon', 'kan')]
+    if len(pons) >= 3:
+        types = [tile.type for tile in pons]
+        numbered = [tile for tile in pons if not tiles.IS_HONOR[tile.cmpval]]
         key = 0
-        types = [tile.type for tile in temp]
-        for tile in temp:
+        for tile in numbered:
             if types.count(tile.type) == 1:
                 key = tile.value
                 break
-        count = []
-        for tile in temp:
-            if ("PINZU" not in count and tile.value == key and 
-                tile.type == "PINZU"):
-                count.append("PINZU")
-            if ("SOUZU" not in count and tile.value == key and 
-                tile.type == "SOUZU"):
-                count.append("SOUZU")
-            if ("MANZU" not in count and tile.value == key and 
-                tile.type == "MANZU"):
-                count.append("MANZU")
-        if 'PINZU' in count and 'SOUZU' in count and 'MANZU' in count:
+        if len(set([tile.type for tile in numbered
+                    if tile.value == key])) == 3:
             han += 2
             yaku.append('san shoku dokuu')
 
     # Seven Pairs
-    if concealed(*sets) and is7pairs(tohand(*sets)):
+    if hidden and count.count(2) == 7:
         han += 2
         fu = 25
         yaku.append('chii toitsu')
 
     # Outside Hand
-    count = 0
-    switch = False
-    for set in sets:
-        key = 0
-        if ischi(set):
-            key = ischi(set)
-            if not switch:
-                switch = True
-            if key.value in [1, 7]:
-                count += 1
+    outside = 0
+    for kind, low in zip(kinds, lows):
+        if kind == 'chi':
+            if low.value in (1, 7):
+                outside += 1
                 break
-        elif ispon(set):
-            key = ispon(set)
-        elif iskan(set):
-            key = iskan(set)
-        elif ispair(set):
-            key = ispair(set)
-        try:
-            if key and key.type in ["DRAGONS", "WINDS"] or key.value in [1, 9]:
-                count += 1
-        except AttributeError:
-            pass
-    if count == len(sets):
+        elif kind is not None:
+            if not tiles.IS_SIMPLE[low.cmpval]:
+                outside += 1
+    if outside == len(sets):
         han += 1
         yaku.append('chanta')
-        if concealed(*sets):
+        if hidden:
             han += 1
 
     # Fanpai
-    for set in sets:
-        if ispon(set) or iskan(set):
-            if set[0].type == "DRAGONS":
+    for kind, low in zip(kinds, lows):
+        if kind in ('pon', 'kan'):
+            if low.type == "DRAGONS":
                 han += 1
                 yaku.append('fanpai')
-            if set[0].type == winds[0]:
+            if low.type == winds[0]:
                 han += 1
                 yaku.append('fanpai')
-            if set[0].type == winds[1]:
+            if low.type == winds[1]:
                 han += 1
                 yaku.append('fanpai')
 
-    # Pure Straight
-    temp = []
-    for set in sets:
-        tile = ischi(set)
-        if tile:
-            temp.append(tile)
-    if len(temp) >= 3:
+    chis = [low for kind, low in zip(kinds, lows) if kind == 'chi']
+    if len(chis) >= 3:
+        types = [tile.type for tile in chis]
+        values = [tile.value for tile in chis]
+
+        # Pure Straight
         for suit in ['PINZU', 'SOUZU', 'MANZU']:
-            if [tile.type for tile in temp].count(suit) >= 3:
-                x = [tile.value for tile in temp]
-                if (x.count(1) >= 1 and 
-                    x.count(4) >= 1 and 
-                    x.count(7) >= 1):
+            if (types.count(suit) >= 3 and 1 in values and 4 in values and
+                7 in values):
+                han += 1
+                yaku.append('itsu')
+                if hidden:
                     han += 1
-                    yaku.append('itsu')
-                    if concealed(*sets):
-                        han += 1
 
-    # Mixed Triple Chi
-    count = [0, 0, 0]
-    temp = []
-    key = 0
-    for set in sets:
-        tile = ischi(set)
-        if tile:
-            temp.append(tile)
-    if len(temp) >= 3:
-        for tile in temp:
-            if [x.type for x in temp].count(tile.type) == 1:
+        # Mixed Triple Chi
+        key = 0
+        for tile in chis:
+            if types.count(tile.type) == 1:
                 key = tile.value
-    if key != 0:
-        for i, suit in enumerate(['PINZU', 'SOUZU', 'MANZU']):
-            for tile in temp:
-                if tile.type == suit and tile.value == key:
-                    count[i] = 1
-                    break
-    if count.count(1) == 3:
-        han += 1
-        yaku.append('san shoku doujun')
-        if concealed(*sets):
+        if len(set([tile.type for tile in chis
+                    if tile.value == key])) == 3:
             han += 1
+            yaku.append('san shoku doujun')
+            if hidden:
+                han += 1
 
-    # Pure Double Chi
-    if concealed(*sets):
+    if hidden:
+        # Pure Double Chi
         temp = []
-        count = 0
-        for set in sets:
-            key = ischi(set)
-            if key:
-                if key.cmpval not in temp:
-                    temp.append(key.cmpval)
-                else:
-                    temp.remove(key.cmpval)
-                    count += 1
-        if count == 1:
+        pairs = 0
+        for tile in chis:
+            if tile.cmpval not in temp:
+                temp.append(tile.cmpval)
+            else:
+                temp.remove(tile.cmpval)
+                pairs += 1
+        if pairs == 1:
             han += 1
             yaku.append('iipeikou')
-        elif count == 2:
+        elif pairs == 2:
             han += 3
             yaku.append('ryan peikou')
 
-    # Pinfu
-    if concealed(*sets):
-        count = 0
-        for set in sets:
-            sort(set)
-            if ischi(set):
-                if hasattr(set[0], "last"):
-                    count += 1
-                    continue
-                if hasattr(set[2], "last"):
-                    count += 1
-                    continue
-            elif ispair(set):
-                # If pair is concealed, then it can't be single wait
-                if concealed(*sets):
-                    count += 1
-        if count == 5:
+        # Pinfu
+        sides = 0
+        for kind, last in zip(kinds, summary.lasts):
+            if kind == 'chi' and last & 5 or kind == 'pair':
+                sides += 1
+        if sides == 5:
             han += 1
             yaku.append('pinfu')
 
     # Tanyao
     # tanyao will be allowed for open hands
-    switch = 0
-    for tile in tohand(*sets):
-        if tile.type in ['DRAGONS', 'WINDS']:
-            switch = 1
-            break
-        if hasattr(tile, "terminal"):
-            switch = 1
-            break
-    if not switch:
+    if not summary.outside:
         han += 1
         yaku.append('tanyao chuu')
 
     # Menzen Tsumo
-    if concealed(*sets) and type == 'tsumo':
+    if hidden and type == 'tsumo':
         han += 1 
         yaku.append('menzen tsumo')
 
     # There needs to be at least one han
     if han < 1:
-        raise ScoringException("score", "han is less than one: " + han)
+        raise ScoringException("score", "han is less than one: " + str(han))
 
     # Calculate fu
     # Don't do this for seven pairs
     if fu != 25:
         # Calculate fu for win
-        if concealed(*sets) and type == 'ron':
+        if hidden and type == 'ron':
             fu += 30
         else:
             fu += 20
         # Calculate fu for sets
-        for set in sets:
-            base = 0
-            if ispon(set):
-                base = 2
-                tile = ispon(set)
-            elif iskan(set):
-                base = 8
-                tile = iskan(set)
-            if base != 0:
-                if concealed(*sets):
+        for kind, low in zip(kinds, lows):
+            if kind in ('pon', 'kan'):
+                base = 2 if kind == 'pon' else 8
+                if hidden:
                     base *= 2
-                if tile.type in ['DRAGONS', 'WINDS']:
+                if tiles.IS_HONOR[low.cmpval]:
                     base *= 2
-                if hasattr(tile, "terminal"):
+                if tiles.IS_TERMINAL[low.cmpval]:
                     base *= 2
                 fu += base
-                # Calculate fu for pair
-                tile = ispair(set)
-                if tile:
-                    if tile.type == 'DRAGONS' or tile.type in winds:
-                        fu += 2
         # fu for tsumo
         if type == 'tsumo' and 'pinfu' not in yaku:
             fu += 2
         # open pinfu
-        if not concealed(*sets) and fu == 20:
+        if not hidden and fu == 20:
             fu += 2
         # single waits
-        for set in sets:
-            sort(set)
-            if ischi(set):
-                if hasattr(set[0], "last"):
-                    fu += 2
-                    break
-                if hasattr(set[2], "last"):
-                    fu += 2
-                    break
-            else:
-                # If pair, pon, kan is not concealed, then it's single wait
-                if not concealed(set):
+        for kind, last, winning in zip(kinds, summary.lasts,
+                                       summary.winning):
+            if kind == 'chi':
+                if last & 5:
                     fu += 2
                     break
+            # If pair, pon, kan is not concealed, then it's single wait
+            elif not winning:
+                fu += 2
+                break
 
     # Dora, Ura Dora
-    if len(dora) > 0:
-        for tile in dora:
-            count = counttile(tohand(*sets), nexttile(tile))
-            han += count
-            yaku.extend(['dora' for i in range(count)])
-    if len(ura) > 0 and 'riichi' in yaku:
+    for tile in dora:
+        x = count[tiles.DORA_SUCCESSOR[tile.cmpval]]
+        han += x
+        yaku.extend(['dora'] * x)
+    if 'riichi' in yaku:
         for tile in ura:
-            count = counttile(tohand(*sets), nexttile(tile))
-            han += count
-            yaku.extend(['ura dora' for i in range(count)])
+            x = count[tiles.DORA_SUCCESSOR[tile.cmpval]]
+            han += x
+            yaku.extend(['ura dora'] * x)
 
     return calc(fu, han, east, type, honba), yaku
 
 
 def highest_score(east, winds, hand, sets, honba=0, bonus=[], dora=[], ura=[]):
-    """Returns the highest score from score().
+    """Returns the highest score from score().  If score_cache is set,
+    results are memoized there.
 
     east 
         1 if East wins, 0 otherwise
@@ -1001,35 +1524,239 @@ def highest_score(east, winds, hand, sets, honba=0, bonus=[], dora=[], ura=[]):
         list of ura-dora indicators
         
     """ 
+    if score_cache is None:
+        return _highest_score(east, winds, hand, sets, honba, bonus, dora, ura)
+    key = _statekey(east, winds, hand, sets, honba, bonus, dora, ura)
+    return _cached(key, _highest_score, east, winds, hand, sets, honba,
+                   bonus, dora, ura)
+
+def _highest_score(east, winds, hand, sets, honba, bonus, dora, ura):
+    """Does the work of highest_score()."""
     possible = makesets(hand)
-    # Find all possible scores
-    scorelist = []
+    candidates = []
     for x in possible:
         y = sets[:]
         y.extend(x)
-        scorelist.append(
-            scoring.score(
-                east, winds, *y, honba=self.honba, bonus=bonus,
-                dora=dora, ura=ura
-            )
-        )
-
-    # Find highest score
-    max = 0
-    try:
-        max_score = scorelist[max][0][0]
-    except TypeError:
-        max_score = scorelist[max][0]
-    for i in range(1, len(scorelist)):
-        try:
-            current = scorelist[i][0][0]
-        except TypeError:
-            current = scorelist[i][0]
-        if current > max_score:
+        candidates.append(y)
+    if not candidates:
+        raise ScoringException("highest_score", "hand is not complete")
+
+    # Score candidates from the highest bound down, stopping once no bound
+    # can beat the best score.  Ties go to the earliest candidate, as a
+    # full scan would.
+    bounds = _scorebounds(east, winds, candidates, honba, bonus, dora, ura)
+    order = sorted(range(len(candidates)), key=lambda i: -bounds[i])
+    best = None
+    for i in order:
+        if best is not None:
+            if bounds[i] < max_score:
+                break
+            if bounds[i] == max_score and i > max:
+                continue
+        result = _score(east, winds, candidates[i], honba, bonus, dora, ura)
+        current = _payment(result[0])
+        if best is None or current > max_score or (current == max_score and
+                                                   i < max):
+            best = result
             max = i
             max_score = current
+    return best
+
+def _cached(key, func, *args):
+    """Returns func(*args), memoized in score_cache by key."""
+    result = score_cache.get(key)
+    if result is None:
+        result = func(*args)
+        score_cache[key] = result
+    return result[0], list(result[1])
+
+def _statekey(east, winds, hand, sets, honba, bonus, dora, ura):
+    """Returns a hashable key for the arguments of score() (hand is None) or
+    highest_score().  Tiles are keyed by cmpval and scoring flags, in the
+    order score() sees them; red fives key as plain fives."""
+    if hand is not None:
+        hand = _tilekeys(hand)
+    return (east, tuple(winds), hand, tuple([_tilekeys(x) for x in sets]),
+            honba, tuple(bonus), tuple([tile.cmpval for tile in dora]),
+            tuple([tile.cmpval for tile in ura]))
+
+def _tilekeys(part):
+    """Returns a tuple of the keys of the tiles in part, sorted by cmpval.
+    A tile's key is its cmpval shifted left by 16, or'd with its flags other
+    than hidden."""
+    return tuple([tile.cmpval << 16 | tile.flags & _KEYFLAGS
+                  for tile in sorted(part, key=_CMPVAL)])
+
+_KEYFLAGS = (tiles.CHI | tiles.PON | tiles.KAN | tiles.CKAN | tiles.ADDEDKAN |
+             tiles.LAST | tiles.RON | tiles.TSUMO)
+
+def _payment(score):
+    """Returns the part of a score from calc() used to compare scores: the
+    non-East payment for tsumo non-East, otherwise the score itself."""
+    try:
+        return score[0]
+    except TypeError:
+        return score
 
-    return scorelist[max]
+def _scorebounds(east, winds, candidates, honba, bonus, dora, ura):
+    """Returns a list with an upper bound of _payment(score()) for each
+    candidate in candidates, a list of sets lists that all hold the same
+    tiles.  Yaku that depend only on the tiles are bounded once for the whole
+    hand; the rest are bounded from the chi and pon of each candidate."""
+    hand = tohand(*candidates[0])
+    count = tocount(hand)
+    hidden = concealed(*candidates[0])
+    tiletypes = set([tile.type for tile in hand])
+    suited = tiletypes - set(["WINDS", "DRAGONS"])
+    simples = sum([count[i] for i in _SIMPLES])
+    simple = simples == len(hand)
+    orphan = not simples
+
+    def wintypes():
+        return [_wintype(y) for y in candidates]
+
+    # hands that return early from score()
+    if 'nagashi mangan' in bonus:
+        return [_payment(calc(20, 5, east, 'tsumo', honba))] * len(candidates)
+    if 'tenhou' in bonus or 'chihou' in bonus or 'renhou' in bonus:
+        return [_payment(calc(20, 13, east, x, honba)) for x in wintypes()]
+    values = [tile.value for tile in hand if hasattr(tile, "value")]
+    # score() returns a yakuman as soon as it finds one, whatever the other
+    # yaku; a candidate that is not one scores as a regular hand, so each
+    # bound is the larger of the two.  Double yakuman are possible only for
+    # dai suushii, chuuren pooto and kokushi musou.
+    # score() counts a pon or kan as concealed for suu ankou only if every
+    # tile in it has the last and ron flags
+    won = [0] * 34
+    for tile in hand:
+        if tile.flags & _WON == _WON:
+            won[tile.cmpval] += 1
+    yakuman = 0
+    if (len([x for x in range(27, 31) if count[x] >= 3]) == 4 or
+        tiletypes == suited and len(suited) == 1 and values.count(1) >= 3 and
+        values.count(9) >= 3 or
+        _is13orphan(count)):
+        yakuman = 26
+    # score() awards tsuu iisou for five honor sets, which a Seven Pairs
+    # hand can have with suited pairs left over; each honor set needs its
+    # own kind with at least two tiles
+    elif (len([x for x in range(27, 31) if count[x] >= 3]) >= 3 or
+          len([x for x in range(31, 34) if count[x] >= 3]) == 3 or
+          not suited or
+          len([x for x in range(27, 34) if count[x] >= 2]) >= 5 or
+          sum([count[i] for i in _TERMINALS]) == len(hand) or
+          sum([count[i] for i in _GREENS]) == len(hand) or
+          count.count(4) >= 4 or
+          hidden and len([x for x in won if x >= 3]) >= 4):
+        yakuman = 13
+
+    # yaku that depend only on the tiles
+    han = len([x for x in bonus if x in ['riichi', 'ippatsu', 'daburu riichi',
+                                         'rinchan kaihou', 'chan kan',
+                                         'haitei']])
+    if tiletypes == suited and len(suited) == 1:
+        han += 5 + hidden
+    if orphan:
+        han += 2
+    if len([x for x in range(31, 34) if count[x] >= 2]) >= 2:
+        han += 2
+    if len(suited) == 1:
+        han += 2
+    if count.count(3) + count.count(4) == 4:
+        han += 2
+    if count.count(4) == 3:
+        han += 2
+    sevenpairs = hidden and count.count(2) == 7
+    if sevenpairs:
+        han += 2
+    if simple:
+        han += 1
+    for x in range(27, 34):
+        if count[x] >= 3:
+            type = "DRAGONS" if x >= 31 else "WINDS"
+            han += ((type == "DRAGONS") + (type == winds[0]) +
+                    (type == winds[1]))
+    for tile in dora:
+        han += count[tiles.DORA_SUCCESSOR[tile.cmpval]]
+    if 'riichi' in bonus:
+        for tile in ura:
+            han += count[tiles.DORA_SUCCESSOR[tile.cmpval]]
+
+    # yaku and fu that depend on the sets
+    bounds = []
+    for y, type in zip(candidates, wintypes()):
+        chis = []
+        pons = []
+        terminal = 0
+        terminalchi = False
+        outside = True
+        fu = 36
+        for part in y:
+            low = min([tile.cmpval for tile in part])
+            ischi = len(part) == 3 and part[0].cmpval != part[1].cmpval
+            if ischi:
+                chis.append(low)
+            elif len(part) >= 3:
+                pons.append(low)
+                base = 2 if len(part) == 3 else 8
+                if hidden:
+                    base *= 2
+                if tiles.IS_HONOR[low]:
+                    base *= 2
+                if tiles.IS_TERMINAL[low]:
+                    base *= 2
+                fu += base
+            if [tile for tile in part if tiles.IS_TERMINAL[tile.cmpval]]:
+                terminal += 1
+                terminalchi = terminalchi or ischi
+            elif not tiles.IS_HONOR[low]:
+                outside = False
+
+        x = han
+        # junchan taiyai, chanta
+        if terminal == 4 and terminalchi:
+            x += 2 + hidden
+        if outside:
+            x += 1 + hidden
+        # itsu, san shoku doujun
+        values = [c % 9 for c in chis]
+        if (max([0] + [len([c for c in chis if c // 9 == suit])
+                       for suit in range(3)]) >= 3 and
+            0 in values and 3 in values and 6 in values):
+            x += 1 + hidden
+        if [v for v in values if v + 9 in chis and v + 18 in chis and
+            v in chis]:
+            x += 1 + hidden
+        # iipeikou, ryan peikou, pinfu
+        if hidden:
+            pairs = sum([chis.count(c) // 2 for c in set(chis)])
+            x += [0, 1, 3][min(pairs, 2)]
+            if chis:
+                x += 1
+        # san ankou, san shoku dokuu
+        if len(pons) >= 3:
+            x += 2
+        if [c for c in pons if c < 9 and c + 9 in pons and c + 18 in pons]:
+            x += 2
+        if hidden and type == 'tsumo':
+            x += 1
+        if sevenpairs:
+            fu = 25
+        bound = max(_payment(calc(fu, min(x, 4), east, type, honba)),
+                    _payment(calc(fu, x, east, type, honba)))
+        if yakuman:
+            bound = max(bound, _payment(calc(20, yakuman, east, type, honba)))
+        bounds.append(bound)
+    return bounds
+
+def _wintype(sets):
+    """Returns the type of win that score() finds for sets."""
+    for tile in tohand(*sets):
+        if tile.flags & tiles.RON:
+            return 'ron'
+        if not tile.flags & tiles.TSUMO:
+            return 'tsumo'
+    return ''
 
 
 class ScoringException(Exception):
@@ -1037,7 +1764,7 @@ class ScoringException(Exception):
         self.func = func
         self.val = val
     def __str__(self):
-        return func + ":" + repr(self.val)
+        return self.func + ":" + repr(self.val)
 
 if __name__ == '__main__':
     from tiles import *
@@ -39,6 +39,30 @@
 
 """
 
+# bits of Tile.flags
+CHI = 1 << 0
+PON = 1 << 1
+KAN = 1 << 2
+CKAN = 1 << 3
+ADDEDKAN = 1 << 4
+LAST = 1 << 5
+RON = 1 << 6
+TSUMO = 1 << 7
+HIDDEN = 1 << 8
+
+def _flag(name, bit):
+    """Returns a property for the flag name, kept as bit in Tile.flags.
+    Getting an unset flag raises AttributeError, so hasattr() tests it."""
+    def get(self):
+        if self.flags & bit:
+            return 1
+        raise AttributeError(name)
+    def set(self, value):
+        self.flags |= bit
+    def delete(self):
+        self.flags &= ~bit
+    return property(get, set, delete)
+
 class Tile:
     """Tile class.
     Universal attributes
@@ -53,6 +77,9 @@ class Tile:
         value
             numeric value of tile
 
+        These are class attributes, shared by every tile of a kind.  Tiles
+        have no __dict__; the only instance attribute is flags.
+
     Flags
         Flags are set to 1 arbitrarily or unset to denote attributes of tiles.
 
@@ -61,6 +88,9 @@ class Tile:
             terminal
             red
 
+            These are class attributes, present only on the tiles they
+            describe.
+
         Scoring
             chi
                 Tile is part of declared chi
@@ -88,11 +118,34 @@ class Tile:
                 Used to facilitate calculating furiten but allow view to
                 display player discards accordingly.  
 
+        Scoring and other flags are kept as bits of the int flags, named by
+        the constants CHI, PON, KAN, CKAN, ADDEDKAN, LAST, RON, TSUMO and
+        HIDDEN.  Setting a flag sets its bit whatever the value, deleting it
+        clears the bit, and reading an unset flag raises AttributeError.
+
+    id
+        the tile's id (see Tile IDs below) if it was made by fromid(), else
+        None
+
+    Tiles compare, order and hash by cmpval, so a red five equals a plain
+    five; identity tells them apart.
+
     """
-    def __init__(self, name, type, cmpval):
-        self.name = name
-        self.type = type
-        self.cmpval = cmpval
+    __slots__ = ('flags', 'id')
+
+    chi = _flag('chi', CHI)
+    pon = _flag('pon', PON)
+    kan = _flag('kan', KAN)
+    ckan = _flag('ckan', CKAN)
+    addedkan = _flag('addedkan', ADDEDKAN)
+    last = _flag('last', LAST)
+    ron = _flag('ron', RON)
+    tsumo = _flag('tsumo', TSUMO)
+    hidden = _flag('hidden', HIDDEN)
+
+    def __init__(self, id=None):
+        self.flags = 0
+        self.id = id
 
     def __str__(self):
         """Returns Tile.name"""
@@ -119,229 +172,334 @@ class Tile:
         else:
             return False
 
+    def __lt__(self, other):
+        """Orders tiles by cmpval attribute."""
+        if not isinstance(other, Tile):
+            return NotImplemented
+        return self.cmpval < other.cmpval
+
+    def __le__(self, other):
+        """Orders tiles by cmpval attribute."""
+        if not isinstance(other, Tile):
+            return NotImplemented
+        return self.cmpval <= other.cmpval
+
+    def __gt__(self, other):
+        """Orders tiles by cmpval attribute."""
+        if not isinstance(other, Tile):
+            return NotImplemented
+        return self.cmpval > other.cmpval
+
+    def __ge__(self, other):
+        """Orders tiles by cmpval attribute."""
+        if not isinstance(other, Tile):
+            return NotImplemented
+        return self.cmpval >= other.cmpval
+
+    def __hash__(self):
+        """Hashes cmpval, so that tiles equal by cmpval hash the same."""
+        return hash(self.cmpval)
+
+    @property
+    def identity(self):
+        """(cmpval, 1) for red fives and (cmpval, 0) for other tiles.  Use it
+        where red fives must not compare or hash equal to plain fives."""
+        return (self.cmpval, 1 if hasattr(self, "red") else 0)
+
 
 class P1(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'P1', 'PINZU', 0)
-        self.terminal = 1
-        self.value = 1
+    __slots__ = ()
+    name = 'P1'
+    type = 'PINZU'
+    cmpval = 0
+    value = 1
+    terminal = 1
 
 
 class P2(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'P2', 'PINZU', 1)
-        self.value = 2
+    __slots__ = ()
+    name = 'P2'
+    type = 'PINZU'
+    cmpval = 1
+    value = 2
 
 
 class P3(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'P3', 'PINZU', 2)
-        self.value = 3
+    __slots__ = ()
+    name = 'P3'
+    type = 'PINZU'
+    cmpval = 2
+    value = 3
 
 
 class P4(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'P4', 'PINZU', 3)
-        self.value = 4
+    __slots__ = ()
+    name = 'P4'
+    type = 'PINZU'
+    cmpval = 3
+    value = 4
 
 
 class P5(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'P5', 'PINZU', 4)
-        self.value = 5
+    __slots__ = ()
+    name = 'P5'
+    type = 'PINZU'
+    cmpval = 4
+    value = 5
+
 
 class P5R(P5):
-    def __init__(self):
-        P5.__init__(self)
-        self.name += 'R'
-        self.red = 1
+    __slots__ = ()
+    name = 'P5R'
+    red = 1
+
 
 class P6(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'P6', 'PINZU', 5)
-        self.value = 6
+    __slots__ = ()
+    name = 'P6'
+    type = 'PINZU'
+    cmpval = 5
+    value = 6
 
 
 class P7(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'P7', 'PINZU', 6)
-        self.value = 7
+    __slots__ = ()
+    name = 'P7'
+    type = 'PINZU'
+    cmpval = 6
+    value = 7
 
 
 class P8(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'P8', 'PINZU', 7)
-        self.value = 8
+    __slots__ = ()
+    name = 'P8'
+    type = 'PINZU'
+    cmpval = 7
+    value = 8
 
 
 class P9(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'P9', 'PINZU', 8)
-        self.terminal = 1
-        self.value = 9
+    __slots__ = ()
+    name = 'P9'
+    type = 'PINZU'
+    cmpval = 8
+    value = 9
+    terminal = 1
 
 
 class S1(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'S1', 'SOUZU', 9)
-        self.terminal = 1
-        self.value = 1
+    __slots__ = ()
+    name = 'S1'
+    type = 'SOUZU'
+    cmpval = 9
+    value = 1
+    terminal = 1
 
 
 class S2(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'S2', 'SOUZU', 10)
-        self.green = 1
-        self.value = 2
+    __slots__ = ()
+    name = 'S2'
+    type = 'SOUZU'
+    cmpval = 10
+    value = 2
+    green = 1
 
 
 class S3(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'S3', 'SOUZU', 11)
-        self.green = 1
-        self.value = 3
+    __slots__ = ()
+    name = 'S3'
+    type = 'SOUZU'
+    cmpval = 11
+    value = 3
+    green = 1
 
 
 class S4(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'S4', 'SOUZU', 12)
-        self.green = 1
-        self.value = 4
+    __slots__ = ()
+    name = 'S4'
+    type = 'SOUZU'
+    cmpval = 12
+    value = 4
+    green = 1
 
 
 class S5(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'S5', 'SOUZU', 13)
-        self.value = 5
+    __slots__ = ()
+    name = 'S5'
+    type = 'SOUZU'
+    cmpval = 13
+    value = 5
+
 
 class S5R(S5):
-    def __init__(self):
-        S5.__init__(self)
-        self.name += 'R'
-        self.red = 1
+    __slots__ = ()
+    name = 'S5R'
+    red = 1
+
 
 class S6(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'S6', 'SOUZU', 14)
-        self.green = 1
-        self.value = 6
+    __slots__ = ()
+    name = 'S6'
+    type = 'SOUZU'
+    cmpval = 14
+    value = 6
+    green = 1
 
 
 class S7(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'S7', 'SOUZU', 15)
-        self.value = 7
+    __slots__ = ()
+    name = 'S7'
+    type = 'SOUZU'
+    cmpval = 15
+    value = 7
 
 
 class S8(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'S8', 'SOUZU', 16)
-        self.green = 1
-        self.value = 8
+    __slots__ = ()
+    name = 'S8'
+    type = 'SOUZU'
+    cmpval = 16
+    value = 8
+    green = 1
 
 
 class S9(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'S9', 'SOUZU', 17)
-        self.terminal = 1
-        self.value = 9
+    __slots__ = ()
+    name = 'S9'
+    type = 'SOUZU'
+    cmpval = 17
+    value = 9
+    terminal = 1
 
 
 class M1(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'M1', 'MANZU', 18)
-        self.terminal = 1
-        self.value = 1
+    __slots__ = ()
+    name = 'M1'
+    type = 'MANZU'
+    cmpval = 18
+    value = 1
+    terminal = 1
 
 
 class M2(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'M2', 'MANZU', 19)
-        self.value = 2
+    __slots__ = ()
+    name = 'M2'
+    type = 'MANZU'
+    cmpval = 19
+    value = 2
 
 
 class M3(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'M3', 'MANZU', 20)
-        self.value = 3
+    __slots__ = ()
+    name = 'M3'
+    type = 'MANZU'
+    cmpval = 20
+    value = 3
 
 
 class M4(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'M4', 'MANZU', 21)
-        self.value = 4
+    __slots__ = ()
+    name = 'M4'
+    type = 'MANZU'
+    cmpval = 21
+    value = 4
 
 
 class M5(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'M5', 'MANZU', 22)
-        self.value = 5
+    __slots__ = ()
+    name = 'M5'
+    type = 'MANZU'
+    cmpval = 22
+    value = 5
+
 
 class M5R(M5):
-    def __init__(self):
-        M5.__init__(self)
-        self.name += 'R'
-        self.red = 1
+    __slots__ = ()
+    name = 'M5R'
+    red = 1
+
 
 class M6(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'M6', 'MANZU', 23)
-        self.value = 6
+    __slots__ = ()
+    name = 'M6'
+    type = 'MANZU'
+    cmpval = 23
+    value = 6
 
 
 class M7(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'M7', 'MANZU', 24)
-        self.value = 7
+    __slots__ = ()
+    name = 'M7'
+    type = 'MANZU'
+    cmpval = 24
+    value = 7
 
 
 class M8(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'M8', 'MANZU', 25)
-        self.value = 8
+    __slots__ = ()
+    name = 'M8'
+    type = 'MANZU'
+    cmpval = 25
+    value = 8
 
 
 class M9(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'M9', 'MANZU', 26)
-        self.terminal = 1
-        self.value = 9
+    __slots__ = ()
+    name = 'M9'
+    type = 'MANZU'
+    cmpval = 26
+    value = 9
+    terminal = 1
 
 
 class E(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'E', 'WINDS', 27)
+    __slots__ = ()
+    name = 'E'
+    type = 'WINDS'
+    cmpval = 27
 
 
 class S(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'S', 'WINDS', 28)
+    __slots__ = ()
+    name = 'S'
+    type = 'WINDS'
+    cmpval = 28
 
 
 class W(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'W', 'WINDS', 29)
+    __slots__ = ()
+    name = 'W'
+    type = 'WINDS'
+    cmpval = 29
 
 
 class N(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'N', 'WINDS', 30)
+    __slots__ = ()
+    name = 'N'
+    type = 'WINDS'
+    cmpval = 30
 
 
 class Wh(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'Wh', 'DRAGONS', 31)
+    __slots__ = ()
+    name = 'Wh'
+    type = 'DRAGONS'
+    cmpval = 31
 
 
 class Gr(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'Gr', 'DRAGONS', 32)
-        self.green = 1
+    __slots__ = ()
+    name = 'Gr'
+    type = 'DRAGONS'
+    cmpval = 32
+    green = 1
 
 
 class Rd(Tile):
-    def __init__(self):
-        Tile.__init__(self, 'Rd', 'DRAGONS', 33)
+    __slots__ = ()
+    name = 'Rd'
+    type = 'DRAGONS'
+    cmpval = 33
 
 
 PINZU = [P1, P2, P3, P4, P5, P6, P7, P8, P9]
@@ -350,3 +508,103 @@ MANZU = [M1, M2, M3, M4, M5, M6, M7, M8, M9]
 WINDS = [E, S, W, N]
 DRAGONS = [Wh, Gr, Rd]
 SUITS = [PINZU, SOUZU, MANZU, WINDS, DRAGONS]
+
+# Tile properties indexed by cmpval
+#
+# SUIT_INDEX      index in SUITS
+# VALUE           value, 0 for honors
+# IS_TERMINAL     True for ones and nines
+# IS_HONOR        True for winds and dragons
+# IS_GREEN        True for the tiles of All Green
+# IS_SIMPLE       True for twos through eights
+# DORA_SUCCESSOR  cmpval of the dora that the tile indicates
+
+def _table(func):
+    """Returns a tuple of func(suit, i, tile) for every tile class in cmpval
+    order, where suit is the index in SUITS and i the index in the suit."""
+    return tuple([func(suit, i, tile) for suit in range(len(SUITS))
+                  for i, tile in enumerate(SUITS[suit])])
+
+SUIT_INDEX = _table(lambda suit, i, tile: suit)
+VALUE = _table(lambda suit, i, tile: getattr(tile, "value", 0))
+IS_TERMINAL = _table(lambda suit, i, tile: hasattr(tile, "terminal"))
+IS_HONOR = _table(lambda suit, i, tile: suit >= 3)
+IS_GREEN = _table(lambda suit, i, tile: hasattr(tile, "green"))
+IS_SIMPLE = _table(lambda suit, i, tile: suit < 3 and 0 < i < 8)
+DORA_SUCCESSOR = _table(
+    lambda suit, i, tile: SUITS[suit][(i + 1) % len(SUITS[suit])].cmpval)
+
+# Tile IDs
+#
+# Each of the 136 physical tiles has an id in range(136).  The four copies of
+# the tile with cmpval c have ids 4 * c to 4 * c + 3, so cmpval is id // 4.
+# The red fives are the first copy of each five, with ids in RED_IDS.  A list
+# of ids is another representation of a hand.
+
+RED_IDS = (16, 52, 88)
+
+def _idclasses():
+    """Returns the list of tile classes indexed by id."""
+    result = []
+    for suit in SUITS:
+        for tile in suit:
+            result.extend([tile] * 4)
+    for id, red in zip(RED_IDS, [P5R, S5R, M5R]):
+        result[id] = red
+    return result
+
+# tile classes indexed by id
+IDCLASSES = _idclasses()
+
+def fromid(id):
+    """Returns a new tile for id."""
+    return IDCLASSES[id](id)
+
+def fromids(ids):
+    """Converts ids to a list of new tiles."""
+    return [IDCLASSES[id](id) for id in ids]
+
+def toid(tile):
+    """Returns the id of tile.  A tile without an id gets the first id of
+    its kind: the red id for red fives, otherwise the first id that is not
+    red."""
+    if tile.id is not None:
+        return tile.id
+    if not hasattr(tile, "red") and tile.cmpval * 4 in RED_IDS:
+        return tile.cmpval * 4 + 1
+    return tile.cmpval * 4
+
+def toids(hand):
+    """Converts hand to a list of distinct ids.  Tiles without an id get the
+    first free id of their kind, as in toid(): the red id for red fives,
+    otherwise the ids that are not red.  Raises ValueError if a kind runs out
+    of ids."""
+    used = set([tile.id for tile in hand if tile.id is not None])
+    result = []
+    for tile in hand:
+        id = tile.id
+        if id is None:
+            for id in _freeids(tile):
+                if id not in used:
+                    break
+            else:
+                raise ValueError("toids(): no ids left for " + repr(tile))
+            used.add(id)
+        result.append(id)
+    return result
+
+def _freeids(tile):
+    """Returns the ids a tile of tile's kind may take, in order."""
+    first = tile.cmpval * 4
+    if first not in RED_IDS:
+        return range(first, first + 4)
+    if hasattr(tile, "red"):
+        return (first,)
+    return range(first + 1, first + 4)
+
+def idcount(ids):
+    """Converts ids to count representation."""
+    count = [0] * 34
+    for id in ids:
+        count[id >> 2] += 1
+    return count
@@ -5,118 +5,137 @@ import random
 import pyriichi.tiles as tiles
 
 class Wall:
-    def __init__(self):
-        temp = []
-        for suit in tiles.SUITS:
-            for tile in suit:
-                for i in range(4):
-                    temp.append(tile())
-
-        # swap in red fives
-        red_done = [0, 0, 0]
-        for i, x in enumerate(temp):
-            if isinstance(x, tiles.P5) and not red_done[0]:
-                temp[i] = tiles.P5R()
-                red_done[0] = 1
-            elif isinstance(x, tiles.S5) and not red_done[1]:
-                temp[i] = tiles.S5R()
-                red_done[1] = 1
-            elif isinstance(x, tiles.M5) and not red_done[2]:
-                temp[i] = tiles.M5R()
-                red_done[2] = 1
-            if sum(red_done) == 3:
-                break
+    """The wall holds tile ids (see pyriichi.tiles), which draw(), rdraw(),
+    take(), dora() and ura() turn into new tiles.  draw_id(), rdraw_id() and
+    take_id() return the ids themselves.
+
+    Attributes
+        tiles
+            sequence of the 136 ids: the four wall sections one after
+            another, read as a ring.  deal() does not move them.
+        head
+            position of the next tile draw() takes
+        tail
+            position just past the last tile of the live wall; rdraw() takes
+            the tile before it
+
+    Positions count from the start of tiles and may run past its end; the
+    tile at position i is tiles[i % 136].
+
+    """
+    def __init__(self, seed=None, rng=None):
+        """seed
+            seed for a new random.Random used to shuffle the wall; the same
+            seed always builds the same wall
+        rng
+            random.Random instance to shuffle with instead of a new one
+
+        """
+        if rng is None:
+            rng = random.Random(seed)
+        self.tiles = list(range(136))
+        rng.shuffle(self.tiles)
+        self.head = 0
+        self.tail = 136
+
+    @classmethod
+    def from_array(cls, row):
+        """Returns a Wall of the ids in row, in order, without shuffling.
 
-        random.seed()
-        for i in range(10):
-            random.shuffle(temp)
-        self.walls = []
-        # build walls
-        for i in range(4):
-            wall = []
-            for j in range(17 * 2):
-                randint = random.randrange(len(temp))
-                wall.append(temp.pop(randint))
-            self.walls.append(wall)
+        row
+            136 distinct ids in any object supporting the buffer protocol
+            with one unsigned byte per item, such as a row of
+            pyriichi.batch.walls().  The Wall reads row in place through a
+            memoryview, so row must not change while it is in use.
+
+        """
+        wall = cls.__new__(cls)
+        wall.tiles = memoryview(row)
+        wall.head = 0
+        wall.tail = 136
+        return wall
 
     def __len__(self):
-        """Total number of tiles in hand, including all four wall sections."""
-        return sum([len(wall) for wall in self.walls])
+        """Number of tiles left in the live wall, or in all four wall
+        sections before deal()."""
+        return self.tail - self.head
 
     def draw(self):
         """Take next tile in wall (taking into consideration all four sections
         and any breaks in wall.  If there are no more tiles in the wall, raise
         WallEmptyError."""
-        # in the beginning, if the dead wall was taken from the middle of a
-        # wall section, may not draw from beginning of wall section
-        if len(self) < 1:
+        return tiles.fromid(self.draw_id())
+
+    def draw_id(self):
+        """Like draw(), but returns the tile id."""
+        if self.head >= self.tail:
             raise WallEmptyError()
-        try:
-            if self.sep >= len(self.walls[self.pointer]):
-                del self.sep
-                self.pointer = (self.pointer + 1) % 4
-            return self.walls[self.pointer].pop(self.sep)
-        except AttributeError:
-            if len(self.walls[self.pointer]) < 1:
-                self.pointer = (self.pointer + 1) % 4
-            return self.walls[self.pointer].pop(0)
+        self.head += 1
+        return self.tiles[(self.head - 1) % 136]
 
     def rdraw(self):
         """Reverse draw, for replacing dead wall tiles."""
-        try:
-            self.sep -= 1
-            if self.sep <= 0:
-                del self.sep
-            return self.walls[self.pointer].pop(self.sep)
-        except AttributeError:
-            return self.walls[(self.pointer - 1) % 4].pop()
+        return tiles.fromid(self.rdraw_id())
+
+    def rdraw_id(self):
+        """Like rdraw(), but returns the tile id."""
+        if self.head >= self.tail:
+            raise WallEmptyError()
+        self.tail -= 1
+        return self.tiles[self.tail % 136]
 
     def deal(self, roll, player_list):
+        """Breaks the wall by roll and deals each player in player_list a
+        starting hand, as from deal_ids().  Each player's hand is sorted
+        once, and the last tile dealt to them is their current draw.
+
+        roll
+            total of the dice
+        player_list
+            the four players, in seat order; the one with wind 0 is dealer
+
+        """
         east = None
         for i, player in enumerate(player_list):
             if player.wind == 0:
                 east = i
                 break
-        self.pointer = self.sep = (east + roll - 1) % 4
+        for player, ids in zip(player_list, self.deal_ids(roll, east)):
+            player.deal(tiles.fromids(ids))
+
+    def deal_ids(self, roll, east):
+        """Breaks the wall by roll and deals four starting hands: three
+        rounds of four tiles to each player, then one more tile each,
+        starting from the dealer.  Returns the hands as four lists of ids in
+        the order dealt, one for each seat.
+
+        roll
+            total of the dice
+        east
+            seat of the dealer
+
+        """
         # remember, wall goes clockwise, but players are counted
         # counterclockwise
-        self.pointer = (self.pointer - 4) % 4
-
-        # separate dead wall
-        dead = []
+        pointer = (east + roll - 1) % 4
         # where to divide the wall
         # tiles are double-stacked
-        self.sep *= 2
-        if self.sep >= 14:
-            dead.extend(self.walls[self.pointer][self.sep - 14:self.sep])
-            del self.walls[self.pointer][self.sep - 14:self.sep]
-            self.sep -= 14
-        else:
-            dead.extend(self.walls[self.pointer][:self.sep])
-            del self.walls[self.pointer][:self.sep]
-            dead.reverse()
-            self.sep = 14 - self.sep
-            prev_wall = (self.pointer - 1) % 4
-            self.sep = len(self.walls[prev_wall]) - self.sep
-            temp = self.walls[prev_wall][self.sep:]
-            temp.reverse()
-            dead.extend(temp)
-            del self.walls[prev_wall][self.sep:]
-            del self.sep
-        self.dead = DeadWall(dead, self)
+        sep = pointer * 2
+
+        # the live wall runs on from the break; the dead wall is the 14 tiles
+        # before it, counted back from the break
+        start = pointer * 34 + sep
+        self.tail = start + 122
+        self.dead = DeadWall(self, start - 1)
+        self.head = start + 52
 
         # deal
-        for i in range(3):
-            for j in range(4):
-                player = (east + j) % 4
-                player_list[player].draw(self)
-                player_list[player].draw(self)
-                player_list[player].draw(self)
-                player_list[player].draw(self)
+        wall = self.tiles
+        hands = [None] * 4
         for j in range(4):
-                player = (east + j) % 4
-                player_list[player].draw(self)
-                player_list[player].sort()
+            hands[(east + j) % 4] = [wall[(start + offset) % 136]
+                                     for offset in _DEALT[j]]
+        return hands
 
     def dora(self):
         """Wrapper for respective DeadWall method."""
@@ -130,23 +149,91 @@ class Wall:
         """Wrapper for respective DeadWall method."""
         return self.dead.take()
 
+    def take_id(self):
+        """Wrapper for respective DeadWall method."""
+        return self.dead.take_id()
+
+    def snapshot(self):
+        """Returns the state of the wall, for restore().  The state leaves out
+        tiles, which nothing but clone() changes."""
+        try:
+            dead = self.dead
+        except AttributeError:
+            return (self.head, self.tail, None)
+        return (self.head, self.tail, dead.snapshot())
+
+    def restore(self, state):
+        """Returns the wall to a state from snapshot() of this wall or of a
+        wall with the same tiles."""
+        self.head, self.tail, dead = state
+        if dead is None:
+            try:
+                del self.dead
+            except AttributeError:
+                pass
+        else:
+            try:
+                self.dead.restore(dead)
+            except AttributeError:
+                self.dead = DeadWall(self, dead[0])
+                self.dead.restore(dead)
+
+    def clone(self, rng=None):
+        """Returns a copy of the wall in the same state.  The copy shares
+        tiles with the wall; draws and kans on either do not affect the
+        other.
+
+        rng
+            random.Random instance.  If given, the copy gets its own tiles,
+            with the ones not yet seen shuffled among themselves: the live
+            wall and the dead wall, except for replacement tiles already
+            taken and dora indicators already turned.
+
+        """
+        wall = self.__class__.__new__(self.__class__)
+        wall.tiles = self.tiles
+        wall.restore(self.snapshot())
+        if rng is not None:
+            wall._shuffle(rng)
+        return wall
+
+    def _shuffle(self, rng):
+        """Gives the wall its own tiles, with the unseen ones shuffled."""
+        try:
+            dead = self.dead
+        except AttributeError:
+            positions = list(range(self.head, self.tail))
+        else:
+            end = dead.start + 136
+            # the live wall and the tiles rdraw() moved to the dead wall
+            positions = list(range(self.head, end - 13))
+            positions.extend([end - index for index in dead.hidden()])
+        positions = [position % 136 for position in positions]
+        self.tiles = list(self.tiles)
+        ids = [self.tiles[position] for position in positions]
+        rng.shuffle(ids)
+        for position, id in zip(positions, ids):
+            self.tiles[position] = id
+
 
 class DeadWall:
-    """DeadWall class; intended to be used as part of Wall class."""
-    def __init__(self, tiles, main_wall):
-        """tiles
-            list of tiles for dead wall
-        main_wall
+    """DeadWall class; intended to be used as part of Wall class.  The dead
+    wall is the 14 tiles of main_wall counting back from position start:
+    four kan replacement tiles, then dora and ura-dora indicators in turn."""
+    def __init__(self, main_wall, start):
+        """main_wall
             reference to main Wall instance that created this DeadWall instance
+        start
+            position in main_wall of the first dead wall tile
 
         """
-        self.wall = tiles
-        self.doralv = 1
         self.main_wall = main_wall
+        self.start = start
+        self.doralv = 1
 
     def __len__(self):
         """Returns number of tiles in wall."""
-        return len(self.wall)
+        return 14
 
     def can_kan(self):
         """Returns True if kans may still be declared and False otherwise."""
@@ -157,25 +244,59 @@ class DeadWall:
             
     def dora(self):
         """Returns a list of dora indicator tiles."""
-        return [self.wall[x] for x in range(self.kantiles, self.kantiles + 2 *
-                                            self.doralv, 2)]
+        return [self._tile(x) for x in range(4, 4 + 2 * self.doralv, 2)]
 
     def ura(self):
         """Returns a list of ura-dora indicator tiles."""
-        return [self.wall[x + 1] for x in range(self.kantiles, self.kantiles + 2
-                                                * self.doralv, 2)]
+        return [self._tile(x) for x in range(5, 5 + 2 * self.doralv, 2)]
 
     def take(self):
         """Pops a tile for kan replacement, also taking replacement tile from
         main wall and adding dora.  If no more replacement tiles, raises
         ModelError."""
+        return tiles.fromid(self.take_id())
+
+    def take_id(self):
+        """Like take(), but returns the tile id."""
         if self.doralv < 5:
+            # the last tile of the live wall moves to the dead wall; if there
+            # is none, the kan fails before any dora is turned
+            self.main_wall.rdraw_id()
             self.doralv += 1
-            self.wall.append(self.main_wall.rdraw())
-            return self.wall.pop(0)
+            return self._id(self.doralv - 2)
         else:
             raise FiveKanError()
 
+    def snapshot(self):
+        """Returns the state of the dead wall, for restore()."""
+        return (self.start, self.doralv)
+
+    def restore(self, state):
+        """Returns the dead wall to a state from snapshot()."""
+        self.start, self.doralv = state
+
+    def hidden(self):
+        """Returns the indices of the dead wall tiles not yet seen: the
+        replacement tiles not yet taken and the indicators not yet turned."""
+        return (list(range(self.doralv - 1, 4)) +
+                [index for index in range(4, 14)
+                 if index % 2 or index >= 4 + 2 * self.doralv])
+
+    def _id(self, index):
+        """Returns the id of the index-th dead wall tile."""
+        return self.main_wall.tiles[(self.start - index) % 136]
+
+    def _tile(self, index):
+        """Returns a new tile for the index-th dead wall tile."""
+        return tiles.fromid(self._id(index))
+
+
+# positions in the live wall of the tiles dealt to each player, counting
+# from the dealer, in the order dealt
+_DEALT = tuple(tuple([16 * i + 4 * j + k for i in range(3) for k in range(4)] +
+                     [48 + j])
+               for j in range(4))
+
 
 class WallError(Exception):
     pass
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import random
+import unittest
+
+import pyriichi.game as game
+import pyriichi.player as player
+
+def _hand(**kwargs):
+    players = [player.Player(x) for x in range(4)]
+    return game.Hand(0, 0, 0, 0, players, **kwargs)
+
+
+class SeedTest(unittest.TestCase):
+    def test_seed_repeats_wall_and_dice(self):
+        a = _hand(seed=7)
+        b = _hand(seed=7)
+        self.assertEqual(a.wall.tiles, b.wall.tiles)
+        self.assertEqual([a.dice.roll() for i in range(20)],
+                         [b.dice.roll() for i in range(20)])
+
+    def test_rng_is_shared(self):
+        a = _hand(rng=random.Random(7))
+        rng = random.Random(7)
+        tiles = list(range(136))
+        rng.shuffle(tiles)
+        self.assertEqual(a.wall.tiles, tiles)
+        self.assertEqual(a.dice.roll(),
+                         rng.randint(1, 6) + rng.randint(1, 6))
+
+    def test_dice_leave_global_random(self):
+        random.seed(3)
+        state = random.getstate()
+        dice = game.Dice()
+        for i in range(10):
+            self.assertTrue(2 <= dice.roll() <= 12)
+        self.assertEqual(random.getstate(), state)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import random
+import unittest
+
+import pyriichi.notation as notation
+import pyriichi.scoring as scoring
+import pyriichi.tiles as tiles
+
+class ParseTest(unittest.TestCase):
+    def test_parse(self):
+        hand = notation.parse('123m406p789s11z')
+        self.assertEqual([tile.name for tile in hand],
+                         ['M1', 'M2', 'M3', 'P4', 'P5R', 'P6', 'S7', 'S8',
+                          'S9', 'E', 'E'])
+        self.assertEqual(notation.parseids('0555m'), [88, 89, 90, 91])
+
+    def test_parsecount(self):
+        count = notation.parsecount('0555m11z')
+        self.assertIsInstance(count, scoring.Count)
+        self.assertEqual(count[22], 4)
+        self.assertEqual(count[27], 2)
+        self.assertEqual(sum(count), 6)
+        self.assertEqual(notation.parsecount('5555m')[22], 4)
+
+    def test_too_many_copies(self):
+        for parser in (notation.parseids, notation.parsecount):
+            self.assertRaises(notation.NotationError, parser, '11111m')
+            self.assertRaises(notation.NotationError, parser, '111m11m')
+            self.assertRaises(notation.NotationError, parser, '05555m')
+        self.assertRaises(notation.NotationError, notation.parseids, '5555m')
+
+    def test_red_fives(self):
+        for parser in (notation.parseids, notation.parsecount):
+            self.assertRaises(notation.NotationError, parser, '00m')
+            self.assertRaises(notation.NotationError, parser, '0m0m')
+            parser('0m0p0s')
+
+    def test_not_notation(self):
+        for text in ('123', '12x', '8z', 'm1'):
+            self.assertRaises(notation.NotationError, notation.parseids,
+                              text)
+            self.assertRaises(notation.NotationError, notation.parsecount,
+                              text)
+
+
+class RoundTripTest(unittest.TestCase):
+    def test_round_trip(self):
+        rng = random.Random(0)
+        for i in range(200):
+            ids = sorted(rng.sample(range(136), 14))
+            text = notation.formatids(ids)
+            parsed = notation.parseids(text)
+            # copies come back as the first free ids, reds as reds
+            self.assertEqual(tiles.idcount(parsed), tiles.idcount(ids))
+            self.assertEqual(set(parsed) & set(tiles.RED_IDS),
+                             set(ids) & set(tiles.RED_IDS))
+            self.assertEqual(notation.formatids(parsed), text)
+            self.assertEqual(notation.format(notation.parse(text)), text)
+            self.assertEqual(notation.format(tiles.fromids(ids)), text)
+            count = notation.parsecount(text)
+            self.assertEqual(count, tiles.idcount(ids))
+            self.assertEqual(notation.parsecount(notation.formatcount(count)),
+                             count)
+
+if __name__ == '__main__':
+    unittest.main()
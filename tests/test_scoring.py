@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+
+import random
+import unittest
+
+import pyriichi.notation as notation
+import pyriichi.scoring as scoring
+import pyriichi.tiles as tiles
+
+class UkeireVisibleTest(unittest.TestCase):
+    def test_34_visible_ids(self):
+        # 34 ids seen outside the hand, two of them P4; a plain list of 34
+        # ids was once read as a count vector
+        hand = notation.parse('23p567p456m789m11s5z')
+        visible = notation.parseids('44p88889999s111122223333444466667777z')
+        self.assertEqual(len(visible), 34)
+        expected = [(31, 0, {0: 4, 3: 2})]
+        self.assertEqual(
+            [x for x in scoring.ukeire(hand, tiles.fromids(visible))
+             if x[0] == 31], expected)
+        self.assertEqual(
+            [x for x in scoring.ukeire(hand,
+                                       scoring.Count(tiles.idcount(visible)))
+             if x[0] == 31], expected)
+
+    def test_rejects_plain_lists(self):
+        self.assertRaises(scoring.ScoringException, scoring.ukeire,
+                          notation.parse('123p'), list(range(34)))
+        self.assertRaises(scoring.ScoringException, scoring.iscomplete,
+                          [0] * 34)
+
+
+def _game(text, won, ron=True, sets=(), **kwargs):
+    """Returns keyword arguments for highest_score() for the winning hand
+    in text.  won is the winning tile, as notation; sets holds (text, flag)
+    for each declared set.  Riichi is declared unless bonus is given."""
+    hand = notation.parse(text)
+    last = [tile for tile in hand
+            if tile.cmpval == notation.parse(won)[0].cmpval][-1]
+    last.last = 1
+    if ron:
+        # score() reads a tile with neither flag as a win by tsumo
+        for tile in hand:
+            tile.tsumo = 1
+        del last.tsumo
+        last.ron = 1
+    else:
+        last.tsumo = 1
+    declared = []
+    for meld, flag in sets:
+        declared.append(notation.parse(meld))
+        for tile in declared[-1]:
+            setattr(tile, flag, 1)
+    game = dict(east=0, winds=['E', 'S'], hand=hand, sets=declared,
+                honba=0, bonus=['riichi'], dora=[], ura=[])
+    game.update(kwargs)
+    return game
+
+def _exhaustive(east, winds, hand, sets, honba, bonus, dora, ura):
+    """Scores every split of hand and returns the highest, as
+    highest_score() did before it bounded and pruned splits."""
+    best = None
+    for split in scoring.makesets(hand):
+        result = scoring.score(east, winds, *(sets + split), honba=honba,
+                               bonus=bonus, dora=dora, ura=ura)
+        if best is None or (scoring._payment(result[0]) >
+                            scoring._payment(best[0])):
+            best = result
+    return best
+
+
+class HighestScoreTest(unittest.TestCase):
+    def check(self, *args, **kwargs):
+        game = _game(*args, **kwargs)
+        self.assertEqual(scoring.highest_score(**game), _exhaustive(**game))
+
+    def test_regular(self):
+        self.check('234m456p789s22z345s', '5s')
+        self.check('234m456p789s22z345s', '5s', ron=False, east=1, bonus=[])
+        self.check('234m456p789s22z', '2z', sets=[('555z', 'pon')],
+                   bonus=[], dora=notation.parse('1z'), honba=2)
+
+    def test_yakuman(self):
+        self.check('19m19p19s12345677z', '7z')
+        self.check('11123455678999m', '5m', ron=False)
+        self.check('123m44p555666777z', '7z', east=1)
+        # bounded as Four Concealed Triplets
+        self.check('111m222p333s444z55z', '4z', ron=False)
+        # four splits, all of them Nine Gates
+        self.check('11112345678999s', '9s', east=1)
+
+    def test_pruned_chinitsu(self):
+        # several splits each, most of them pruned by their bounds
+        self.check('11122233344455m', '1m', ron=False)
+        self.check('11122233344455m', '3m')
+        self.check('22334455667788p', '5p')
+        self.check('22233344455s', '4s', sets=[('666s', 'pon')], bonus=[])
+
+
+def _regular_shanten(count, melds, partials=0, pair=0, memo=None):
+    """Returns the shanten number of count as sets and a pair by trying
+    every way of taking sets, partial sets, the pair and lone tiles off its
+    lowest tile."""
+    if memo is None:
+        memo = {}
+    key = (tuple(count), melds, partials, pair)
+    if key in memo:
+        return memo[key]
+    i = 0
+    while i < 34 and not count[i]:
+        i += 1
+    if i == 34:
+        return 8 - 2 * melds - min(partials, 4 - melds) - pair
+    # (tiles taken, sets, partial sets, pair)
+    shapes = [((i,), 0, 0, 0), ((i, i, i), 1, 0, 0), ((i, i), 0, 1, 0),
+              ((i, i), 0, 0, 1)]
+    if i < 27 and i % 9 < 8:
+        shapes.append(((i, i + 1), 0, 1, 0))
+    if i < 27 and i % 9 < 7:
+        shapes.append(((i, i + 2), 0, 1, 0))
+        shapes.append(((i, i + 1, i + 2), 1, 0, 0))
+    best = 8
+    for taken, m, t, p in shapes:
+        if p and pair or t and melds + partials >= 4:
+            continue
+        for j in taken:
+            count[j] -= 1
+        if min(count) >= 0:
+            best = min(best, _regular_shanten(count, melds + m, partials + t,
+                                              pair + p, memo))
+        for j in taken:
+            count[j] += 1
+    memo[key] = best
+    return best
+
+def _shanten(count, melds=0):
+    """Returns shanten() of count the slow way."""
+    result = _regular_shanten(list(count), melds)
+    if not melds and sum(count) >= 13:
+        pairs = len([x for x in count if x >= 2])
+        kinds = len([x for x in count if x])
+        orphans = [count[i] for i in scoring._ORPHANS]
+        result = min(result, 6 - pairs + max(0, 7 - kinds),
+                     13 - len([x for x in orphans if x]) -
+                     (max(orphans) >= 2))
+    return result
+
+def _randcount(rng, size, kinds=range(34)):
+    """Returns a count of size tiles drawn from the kinds given."""
+    wall = [i for i in kinds for j in range(4)]
+    count = [0] * 34
+    for i in rng.sample(wall, size):
+        count[i] += 1
+    return count
+
+def _randtenpai(rng, melds):
+    """Returns a complete hand of 14 - 3 * melds tiles less one tile."""
+    while True:
+        count = [0] * 34
+        for k in range(4 - melds):
+            i = rng.randrange(34)
+            if i < 27 and i % 9 < 7 and rng.random() < 0.6:
+                for j in (i, i + 1, i + 2):
+                    count[j] += 1
+            else:
+                count[i] += 3
+        count[rng.randrange(34)] += 2
+        if max(count) <= 4:
+            break
+    count[rng.choice([i for i in range(34) if count[i]])] -= 1
+    return count
+
+
+class ShantenTest(unittest.TestCase):
+    def test_random(self):
+        rng = random.Random(1)
+        for k in range(300):
+            melds = rng.choice([0, 0, 1, 2])
+            size = rng.choice([13, 14]) - 3 * melds
+            if k % 3:
+                count = _randcount(rng, size)
+            else:
+                count = _randcount(rng, size, range(9, 18))
+            self.assertEqual(scoring.shanten(scoring.Count(count), melds),
+                             _shanten(count, melds), (count, melds))
+
+    def test_special(self):
+        for text, expected in (('19m19p19s1234567z', 0),
+                               ('19m19p19s12345677z', -1),
+                               ('113355779m1133p', 0),
+                               ('113355779m1134p', 1)):
+            count = notation.parsecount(text)
+            self.assertEqual(scoring.shanten(count), expected)
+            self.assertEqual(_shanten(count), expected)
+
+
+class WaitmaskTest(unittest.TestCase):
+    def check(self, count, melds=0):
+        expected = 0
+        for i in range(34):
+            if count[i] < 4:
+                count[i] += 1
+                if _shanten(count, melds) == -1:
+                    expected |= 1 << i
+                count[i] -= 1
+        self.assertEqual(scoring.waitmask(scoring.Count(count)), expected,
+                         count)
+
+    def test_random(self):
+        rng = random.Random(2)
+        for k in range(30):
+            melds = rng.choice([0, 0, 1, 2])
+            self.check(_randtenpai(rng, melds), melds)
+        for k in range(10):
+            self.check(_randcount(rng, 13, range(18, 27)))
+
+    def test_special(self):
+        for text in ('19m19p19s1234567z', '19m19p19s1234566z',
+                     '113355779m1133p', '1112345678999m', '1111222233334m'):
+            self.check(notation.parsecount(text))
+
+
+class UkeireTest(unittest.TestCase):
+    def test_random(self):
+        # every discard and draw, by shanten(), which ShantenTest checks
+        rng = random.Random(3)
+        for k in range(100):
+            melds = rng.choice([0, 0, 0, 1, 2])
+            size = 14 - 3 * melds
+            wall = [i for i in range(34) for j in range(4)]
+            if not k % 4:
+                wall = [i for i in wall if i < 9 or i >= 27]
+            rng.shuffle(wall)
+            count = [0] * 34
+            for i in wall[:size]:
+                count[i] += 1
+            visible = [0] * 34
+            for i in wall[size:size + 20]:
+                visible[i] += 1
+            unseen = [max(0, 4 - count[i] - visible[i]) for i in range(34)]
+            expected = []
+            for discard in range(34):
+                if not count[discard]:
+                    continue
+                count[discard] -= 1
+                base = scoring.shanten(scoring.Count(count), melds)
+                improving = {}
+                for i in range(34):
+                    if count[i] < 4:
+                        count[i] += 1
+                        if scoring.shanten(scoring.Count(count),
+                                           melds) < base:
+                            improving[i] = unseen[i]
+                        count[i] -= 1
+                count[discard] += 1
+                expected.append((discard, base, improving))
+            self.assertEqual(
+                scoring.ukeire(scoring.Count(count), scoring.Count(visible),
+                               melds), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+
+import unittest
+
+import pyriichi.tiles as tiles
+
+class ToidsTest(unittest.TestCase):
+    def test_round_trip(self):
+        hand = [tiles.P5(), tiles.P5(), tiles.P5R(), tiles.P5(), tiles.E(),
+                tiles.E(), tiles.Rd()]
+        ids = tiles.toids(hand)
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual([type(tile) for tile in tiles.fromids(ids)],
+                         [type(tile) for tile in hand])
+        self.assertEqual(ids[2], 16)
+
+    def test_keeps_existing_ids(self):
+        hand = [tiles.fromid(17), tiles.P5(), tiles.fromid(132), tiles.Rd()]
+        self.assertEqual(tiles.toids(hand), [17, 18, 132, 133])
+
+    def test_kind_runs_out(self):
+        self.assertRaises(ValueError, tiles.toids,
+                          [tiles.P5() for i in range(4)])
+        self.assertRaises(ValueError, tiles.toids, [tiles.P5R(), tiles.P5R()])
+        self.assertRaises(ValueError, tiles.toids,
+                          [tiles.Rd() for i in range(5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+import random
+import unittest
+
+import pyriichi.wall as wall
+
+class _Seat:
+    """Stands in for a Player in Wall.deal()."""
+    def __init__(self, wind):
+        self.wind = wind
+        self.hand = []
+
+    def deal(self, tiles):
+        self.hand.extend([tile.id for tile in tiles])
+
+
+def _deal(w, roll, east):
+    seats = [_Seat((i - east) % 4) for i in range(4)]
+    w.deal(roll, seats)
+    return [seat.hand for seat in seats]
+
+def _expected(ids, roll, east):
+    """Deals ids by hand: the wall breaks 2 * pointer tiles into section
+    pointer, draws run on from the break and the dead wall is the 14 tiles
+    before it."""
+    pointer = (east + roll - 1) % 4
+    start = pointer * 34 + pointer * 2
+    live = [ids[(start + i) % 136] for i in range(122)]
+    dead = [ids[(start - 1 - i) % 136] for i in range(14)]
+    hands = [[] for i in range(4)]
+    position = 0
+    for i in range(3):
+        for j in range(4):
+            hands[(east + j) % 4].extend(live[position:position + 4])
+            position += 4
+    for j in range(4):
+        hands[(east + j) % 4].append(live[position])
+        position += 1
+    return hands, live[52:], dead
+
+
+class DealTest(unittest.TestCase):
+    def test_deal_order(self):
+        for seed in range(5):
+            for roll in range(2, 13):
+                for east in range(4):
+                    w = wall.Wall(seed)
+                    ids = list(w.tiles)
+                    hands, live, dead = _expected(ids, roll, east)
+                    self.assertEqual(_deal(w, roll, east), hands)
+                    self.assertEqual(len(w), 70)
+                    self.assertEqual([w.dead._id(i) for i in range(14)],
+                                     dead)
+                    self.assertEqual([tile.id for tile in w.dora()],
+                                     [dead[4]])
+                    self.assertEqual([tile.id for tile in w.ura()],
+                                     [dead[5]])
+                    self.assertEqual(w.rdraw_id(), live[-1])
+                    self.assertEqual(w.draw_id(), live[0])
+
+    def test_take(self):
+        w = wall.Wall(1)
+        _deal(w, 7, 0)
+        dead = [w.dead._id(i) for i in range(14)]
+        for i in range(4):
+            self.assertEqual(w.take_id(), dead[i])
+            self.assertEqual(len(w), 69 - i)
+        self.assertEqual([tile.id for tile in w.dora()], dead[4:14:2])
+        self.assertRaises(wall.FiveKanError, w.take_id)
+
+    def test_take_from_empty_wall(self):
+        w = wall.Wall(1)
+        _deal(w, 7, 0)
+        while len(w):
+            w.draw_id()
+        self.assertRaises(wall.WallEmptyError, w.take_id)
+        self.assertEqual(w.dead.doralv, 1)
+        self.assertEqual(len(w.dora()), 1)
+
+
+class SnapshotTest(unittest.TestCase):
+    def test_restore(self):
+        w = wall.Wall(2)
+        _deal(w, 5, 1)
+        state = w.snapshot()
+        first = [w.draw_id() for i in range(10)] + [w.take_id()]
+        w.restore(state)
+        self.assertEqual([w.draw_id() for i in range(10)] + [w.take_id()],
+                         first)
+
+    def test_clone(self):
+        w = wall.Wall(3)
+        _deal(w, 9, 2)
+        w.take_id()
+        state = w.snapshot()
+        copy = w.clone()
+        self.assertIs(copy.tiles, w.tiles)
+        copy.draw_id()
+        copy.take_id()
+        self.assertEqual(w.snapshot(), state)
+
+    def test_shuffled_clone(self):
+        w = wall.Wall(4)
+        _deal(w, 3, 0)
+        w.take_id()
+        copy = w.clone(random.Random(0))
+        self.assertEqual(sorted(copy.tiles), list(range(136)))
+        self.assertEqual(copy.dora()[0].id, w.dora()[0].id)
+        self.assertEqual(copy.dead._id(0), w.dead._id(0))
+        # the live wall, the tile the kan moved to the dead wall and the
+        # unseen dead wall tiles
+        hidden = lambda x: sorted(
+            [x.tiles[i % 136] for i in range(x.head, x.dead.start + 123)] +
+            [x.dead._id(i) for i in x.dead.hidden()])
+        self.assertEqual(hidden(copy), hidden(w))
+
+
+if __name__ == '__main__':
+    unittest.main()